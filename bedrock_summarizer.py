@@ -9,6 +9,9 @@ import json
 import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
 
+from ingestion import iter_chunks, iter_text
+from main import BedrockSummarizer as StreamingSummarizer, get_text_stats
+
 
 class BedrockSummarizer:
     """Handles text summarization using Amazon Bedrock."""
@@ -69,6 +72,8 @@ The summary should be {params['description']}.
 
 Text to summarize:
 {text}
+
+Summary:"""
         
         # Prepare request body for Claude 3
         request_body = {
@@ -132,14 +137,14 @@ Text to summarize:
         return summaries
 
 
-def print_results(summaries, original_text):
+def print_results(summaries, stats):
     """Print summaries in a structured format."""
     print("\n" + "=" * 80)
     print("SUMMARIZATION RESULTS")
     print("=" * 80)
     
-    print(f"\n📄 Original Text Length: {len(original_text)} characters")
-    print(f"   Word Count: {len(original_text.split())} words")
+    print(f"\n📄 Original Text Length: {stats['characters']} characters")
+    print(f"   Word Count: {stats['words']} words")
     
     print("\n" + "-" * 80)
     print("SHORT SUMMARY (2-3 sentences)")
@@ -164,10 +169,14 @@ def print_results(summaries, original_text):
 
 
 def load_text_from_file(filepath):
-    """Load text from a file."""
+    """
+    Read statistics for a file (plain or gzip) in one streaming pass.
+    
+    The text itself is never held in memory; summarize it with
+    iter_chunks(filepath).
+    """
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
+        return get_text_stats(iter_text(filepath))
     except FileNotFoundError:
         print(f"❌ File not found: {filepath}")
         sys.exit(1)
@@ -192,28 +201,42 @@ def main():
         print("  set AWS_DEFAULT_REGION=us-east-1")
         sys.exit(1)
     
-    # Get input text
+    region = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+    
+    # Files are streamed chunk by chunk, so memory stays flat for any size
     if len(sys.argv) > 1:
-        # Load from file if provided
         filepath = sys.argv[1]
-        print(f"📂 Loading text from: {filepath}\n")
-        text = load_text_from_file(filepath)
-    else:
-        # Use sample text for demonstration
-        print("ℹ️  No input file provided. Using sample text.")
-        print("   Usage: python bedrock_summarizer.py <text_file.txt>\n")
-        
-        text = """
-        Artificial intelligence (AI) is transforming the way we live and work. From healthcare to finance, 
-        AI technologies are being deployed across industries to improve efficiency, accuracy, and decision-making. 
-        Machine learning, a subset of AI, enables computers to learn from data without being explicitly programmed. 
-        Deep learning, which uses neural networks with multiple layers, has achieved remarkable success in areas 
-        like image recognition, natural language processing, and autonomous vehicles. However, the rapid advancement 
-        of AI also raises important ethical questions about privacy, bias, job displacement, and the need for 
-        responsible AI development. As AI continues to evolve, it's crucial that we develop frameworks and 
-        regulations to ensure these technologies benefit society while minimizing potential harms. The future 
-        of AI holds immense promise, but it requires careful consideration of both its capabilities and limitations.
-        """
+        print(f"📂 Streaming text from: {filepath}\n")
+        stats = load_text_from_file(filepath)
+        if stats['characters'] < 50:
+            print("❌ Text is too short to summarize (minimum 50 characters)")
+            sys.exit(1)
+        try:
+            summarizer = StreamingSummarizer(region=region)
+            print("🔄 Generating summaries...")
+            summaries = summarizer.summarize_stream(iter_chunks(filepath))
+            print_results(summaries, stats)
+            print("\n✓ Summarization complete!")
+        except Exception as e:
+            print(f"\n❌ Summarization failed: {str(e)}")
+            sys.exit(1)
+        return
+    
+    # Use sample text for demonstration
+    print("ℹ️  No input file provided. Using sample text.")
+    print("   Usage: python bedrock_summarizer.py <text_file.txt>\n")
+    
+    text = """
+    Artificial intelligence (AI) is transforming the way we live and work. From healthcare to finance, 
+    AI technologies are being deployed across industries to improve efficiency, accuracy, and decision-making. 
+    Machine learning, a subset of AI, enables computers to learn from data without being explicitly programmed. 
+    Deep learning, which uses neural networks with multiple layers, has achieved remarkable success in areas 
+    like image recognition, natural language processing, and autonomous vehicles. However, the rapid advancement 
+    of AI also raises important ethical questions about privacy, bias, job displacement, and the need for 
+    responsible AI development. As AI continues to evolve, it's crucial that we develop frameworks and 
+    regulations to ensure these technologies benefit society while minimizing potential harms. The future 
+    of AI holds immense promise, but it requires careful consideration of both its capabilities and limitations.
+    """
     
     # Validate text length
     if len(text.strip()) < 50:
@@ -221,13 +244,12 @@ def main():
         sys.exit(1)
     
     # Initialize summarizer
-    region = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
     summarizer = BedrockSummarizer(region=region)
     
     # Generate summaries
     try:
         summaries = summarizer.summarize_all_lengths(text.strip())
-        print_results(summaries, text.strip())
+        print_results(summaries, get_text_stats(text.strip()))
         print("\n✓ Summarization complete!")
         
     except Exception as e:
@@ -0,0 +1,341 @@
+"""
+Amazon Bedrock Content Summarizer - Length Calibration
+Tunes max_tokens and stop sequences per model and length from observed outputs.
+
+Usage (offline report):
+    python calibration.py calibration.jsonl
+"""
+
+import json
+import math
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from main import LENGTH_PARAMS
+
+
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s|$)')
+COMPLETE_ENDING = re.compile(r'[.!?]["\')\]]*\s*$')
+PREFILL = '<summary>'
+CLOSING_TAG = '</summary>'
+
+
+def count_sentences(text):
+    """Number of sentences, counting a trailing fragment as one."""
+    text = text.strip()
+    if not text:
+        return 0
+    ends = list(SENTENCE_END.finditer(text))
+    trailing = 1 if not ends or ends[-1].end() < len(text.rstrip()) else 0
+    return len(ends) + trailing
+
+
+def count_paragraphs(text):
+    """Number of non-empty paragraphs separated by blank lines."""
+    return len([block for block in re.split(r'\n\s*\n', text.strip()) if block.strip()])
+
+
+def is_truncated(stop_reason):
+    """Whether the output was cut off by max_tokens."""
+    return stop_reason == 'max_tokens'
+
+
+def is_unterminated(text):
+    """Whether the text does not end on sentence punctuation."""
+    return not COMPLETE_ENDING.search(text.strip())
+
+
+def repair_ending(text):
+    """
+    Trim a truncated summary back to its last complete sentence.
+
+    Args:
+        text (str): Possibly truncated summary
+
+    Returns:
+        str: Text ending on a full sentence, or the text with an ellipsis if
+            it has no complete sentence ('' stays '')
+    """
+    text = text.strip()
+    if not text or COMPLETE_ENDING.search(text):
+        return text
+    ends = list(SENTENCE_END.finditer(text))
+    if ends:
+        return text[:ends[-1].end()].rstrip()
+    return text.rstrip(' ,;:-') + '…'
+
+
+def _percentile(ordered, pct):
+    """Percentile of an already sorted list, or None if it is empty."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def _sentence_cap(samples, high, headroom):
+    """
+    max_tokens that fits the sentence target: the median output tokens per
+    sentence of complete outputs times the target's upper bound, plus
+    headroom. None if no complete output has a sentence.
+    """
+    rates = sorted(
+        sample['output_tokens'] / sample['sentences']
+        for sample in samples if not sample['truncated'] and sample['sentences']
+    )
+    if not rates:
+        return None
+    return math.ceil(_percentile(rates, 50) * high * headroom)
+
+
+class LengthCalibrator:
+    """
+    Learns how many output tokens each model needs for each summary length.
+
+    The prompt asks for the summary inside <summary> tags: the opening tag
+    is prefilled and the closing tag is a stop sequence, so generation ends
+    as soon as the summary does. max_tokens is set from the observed p95 of
+    complete outputs plus headroom, and raised again if too many outputs
+    stop at max_tokens, but never above what the sentence target needs at
+    the observed tokens per sentence. If too many outputs run past the
+    target anyway, the prompt also states the sentence limit. Truncated
+    outputs are trimmed back to the last full sentence. Outputs that finish
+    normally are left as they are; the report only counts how many of them
+    end without punctuation.
+    """
+
+    format_instruction = f"Write the summary inside {PREFILL}{CLOSING_TAG} tags."
+
+    def __init__(self, path=None, window=500, min_samples=20, headroom=1.15,
+                 max_truncation_rate=0.02, max_too_long_rate=0.2, min_tokens=32):
+        """
+        Initialize the calibrator.
+
+        Args:
+            path (str): JSON Lines file that samples are appended to and
+                loaded from, for persistence and offline reports
+            window (int): Recent samples kept per (model, length)
+            min_samples (int): Samples required before max_tokens is tuned
+            headroom (float): Multiplier on the observed p95 output tokens
+            max_truncation_rate (float): Share of outputs stopped by
+                max_tokens that triggers a larger max_tokens
+            max_too_long_rate (float): Share of outputs over the sentence
+                target that adds the sentence limit to the prompt
+            min_tokens (int): Lowest max_tokens ever requested
+        """
+        self.path = path
+        self.window = window
+        self.min_samples = min_samples
+        self.headroom = headroom
+        self.max_truncation_rate = max_truncation_rate
+        self.max_too_long_rate = max_too_long_rate
+        self.min_tokens = min_tokens
+        self._samples = {}
+        self._lock = threading.Lock()
+        if path:
+            for sample in load_samples(path):
+                self._keep(sample)
+
+    def _keep(self, sample):
+        """Add a sample to the in-memory window."""
+        key = (sample['model'], sample['length'])
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+        samples.append(sample)
+
+    def _recent(self, model_id, length_type):
+        """Copy of the sample window for a model and length."""
+        with self._lock:
+            return list(self._samples.get((model_id, length_type), ()))
+
+    def instructions(self, model_id, length_type):
+        """
+        Prompt text for a model and length: the output tags, plus the
+        sentence limit once too many outputs have run past it.
+        """
+        samples = self._recent(model_id, length_type)
+        if len(samples) < self.min_samples:
+            return self.format_instruction
+        high = LENGTH_PARAMS.get(length_type, LENGTH_PARAMS['medium'])['sentences'][1]
+        too_long = sum(1 for sample in samples if sample['sentences'] > high)
+        if too_long / len(samples) <= self.max_too_long_rate:
+            return self.format_instruction
+        return f"{self.format_instruction} Use no more than {high} sentences."
+
+    def request_params(self, model_id, length_type):
+        """
+        Get the generation settings for a model and length.
+
+        Returns:
+            dict: 'max_tokens', 'stop_sequences' and the assistant 'prefill'
+        """
+        return {
+            'max_tokens': self.max_tokens(model_id, length_type),
+            'stop_sequences': [CLOSING_TAG],
+            'prefill': PREFILL
+        }
+
+    def max_tokens(self, model_id, length_type):
+        """Calibrated max_tokens, or the default until enough samples exist."""
+        params = LENGTH_PARAMS.get(length_type, LENGTH_PARAMS['medium'])
+        default = params['max_tokens']
+        samples = self._recent(model_id, length_type)
+        if len(samples) < self.min_samples:
+            return default
+
+        complete = sorted(sample['output_tokens'] for sample in samples if not sample['truncated'])
+        limit = math.ceil(_percentile(complete, 95) * self.headroom) if complete else default
+        truncated = [sample for sample in samples if sample['truncated']]
+        if len(truncated) / len(samples) > self.max_truncation_rate:
+            limit = max(limit, math.ceil(max(sample['max_tokens'] for sample in truncated) * 1.25))
+        # Outputs cut at the sentence cap are trimmed to whole sentences,
+        # so truncation there does not raise the limit past it
+        cap = _sentence_cap(samples, params['sentences'][1], self.headroom)
+        if cap is not None:
+            limit = min(limit, cap)
+        limit = int(math.ceil(limit / 10.0) * 10)
+        return max(self.min_tokens, min(limit, default * 2))
+
+    def record(self, model_id, length_type, text, output_tokens, stop_reason, max_tokens):
+        """
+        Record one model output and repair its ending if max_tokens cut it off.
+
+        Args:
+            model_id (str): Bedrock model ID
+            length_type (str): 'short', 'medium', or 'long'
+            text (str): Generated summary
+            output_tokens (int): Output tokens reported by Bedrock
+            stop_reason (str): Bedrock stop_reason
+            max_tokens (int): max_tokens the request used
+
+        Returns:
+            str: The summary, trimmed to a complete sentence if needed
+        """
+        text = text.replace(CLOSING_TAG, '').strip()
+        truncated = is_truncated(stop_reason)
+        sample = {
+            'model': model_id,
+            'length': length_type,
+            'output_tokens': int(output_tokens or 0),
+            'max_tokens': int(max_tokens),
+            'stop_reason': stop_reason,
+            'sentences': count_sentences(text),
+            'paragraphs': count_paragraphs(text),
+            'truncated': truncated,
+            'unterminated': is_unterminated(text),
+            'created_at': time.time()
+        }
+        with self._lock:
+            self._keep(sample)
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(sample) + '\n')
+        return self.finish(text, stop_reason)
+
+    def finish(self, text, stop_reason):
+        """
+        Clean up an output without recording it: drop the closing tag and
+        trim a truncated ending back to the last full sentence.
+
+        Args:
+            text (str): Generated text
+            stop_reason (str): Bedrock stop_reason
+
+        Returns:
+            str: The cleaned text
+        """
+        text = text.replace(CLOSING_TAG, '').strip()
+        return repair_ending(text) if is_truncated(stop_reason) else text
+
+    def report(self):
+        """Length report over the samples currently held in memory."""
+        with self._lock:
+            samples = [sample for window in self._samples.values() for sample in window]
+        return length_report(samples)
+
+
+def load_samples(path):
+    """Read calibration samples from a JSON Lines file (missing file = none)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def length_report(samples, headroom=1.15):
+    """
+    Compare observed summary lengths against the targets.
+
+    Args:
+        samples (list): Samples as recorded by LengthCalibrator
+        headroom (float): Multiplier used for the recommended max_tokens
+
+    Returns:
+        dict: Per (model, length): sample count, sentence distribution and
+            share within the target range, output token percentiles,
+            truncation rate (stopped by max_tokens), rate of outputs
+            ending without punctuation, max_tokens used and a recommended
+            max_tokens (p95 plus headroom, capped by the sentence target)
+    """
+    grouped = {}
+    for sample in samples:
+        grouped.setdefault((sample['model'], sample['length']), []).append(sample)
+
+    report = {}
+    for (model, length), group in sorted(grouped.items()):
+        low, high = LENGTH_PARAMS.get(length, LENGTH_PARAMS['medium'])['sentences']
+        sentences = [sample['sentences'] for sample in group]
+        tokens = sorted(sample['output_tokens'] for sample in group)
+        complete = sorted(sample['output_tokens'] for sample in group if not sample['truncated'])
+        recommended = math.ceil(_percentile(complete, 95) * headroom) if complete else None
+        cap = _sentence_cap(group, high, headroom)
+        if recommended is not None and cap is not None:
+            recommended = min(recommended, cap)
+        report[f'{model}/{length}'] = {
+            'samples': len(group),
+            'target_sentences': [low, high],
+            'sentence_histogram': dict(sorted(Counter(sentences).items())),
+            'within_target': sum(1 for count in sentences if low <= count <= high) / len(group),
+            'too_long': sum(1 for count in sentences if count > high) / len(group),
+            'too_short': sum(1 for count in sentences if count < low) / len(group),
+            'output_tokens_mean': sum(tokens) / len(tokens),
+            'output_tokens_p50': _percentile(tokens, 50),
+            'output_tokens_p95': _percentile(tokens, 95),
+            'truncation_rate': sum(1 for sample in group if sample['truncated']) / len(group),
+            'unterminated_rate': sum(1 for sample in group if sample.get('unterminated')) / len(group),
+            'max_tokens_used': max(sample['max_tokens'] for sample in group),
+            'recommended_max_tokens': recommended
+        }
+    return report
+
+
+def print_report(report):
+    """Print a length report in a readable layout."""
+    print("=" * 80)
+    print("SUMMARY LENGTH CALIBRATION REPORT")
+    print("=" * 80)
+    for key, row in report.items():
+        low, high = row['target_sentences']
+        print(f"\n{key}  ({row['samples']} samples, target {low}-{high} sentences)")
+        print("-" * 80)
+        print(f"   Within target:   {row['within_target']:.0%}  "
+              f"(too short {row['too_short']:.0%}, too long {row['too_long']:.0%})")
+        print(f"   Sentences:       {row['sentence_histogram']}")
+        print(f"   Output tokens:   mean {row['output_tokens_mean']:.0f}, "
+              f"p50 {row['output_tokens_p50']}, p95 {row['output_tokens_p95']}")
+        print(f"   Truncated:       {row['truncation_rate']:.1%}  "
+              f"(no final punctuation {row['unterminated_rate']:.1%})")
+        print(f"   max_tokens:      used {row['max_tokens_used']}, "
+              f"recommended {row['recommended_max_tokens']}")
+    print("\n" + "=" * 80)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python calibration.py <calibration.jsonl>")
+        sys.exit(1)
+    print_report(length_report(load_samples(sys.argv[1])))
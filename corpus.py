@@ -0,0 +1,370 @@
+"""
+Amazon Bedrock Content Summarizer - Corpus Mode
+Cluster many documents by topic and summarize each cluster, then the corpus.
+"""
+
+import math
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from deadlines import Deadline, DeadlineExceeded, SummaryCancelled
+from main import EMBEDDING_MODEL_ID
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9']+")
+
+
+def bedrock_embeddings(summarizer, documents, model_id=EMBEDDING_MODEL_ID,
+                       max_chars=20000, max_workers=8, timeout=None, cancel_token=None):
+    """
+    Embed documents with a Bedrock embedding model.
+
+    Calls go through summarizer.embed_text(), so they are admitted and
+    charged by the summarizer's scheduler and honor the deadline and token.
+    If any call fails, the calls not yet started are cancelled.
+
+    Args:
+        summarizer (BedrockSummarizer): Summarizer used for model calls
+        documents (list): Document texts
+        model_id (str): Bedrock embedding model ID
+        max_chars (int): Characters of each document sent for embedding
+        max_workers (int): Concurrent embedding requests
+        timeout (float or Deadline): Time budget for all embeddings
+        cancel_token (CancellationToken): Token to stop the remaining work
+
+    Returns:
+        numpy.ndarray: One L2-normalized row per document
+    """
+    deadline = Deadline.coerce(timeout)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(summarizer.embed_text, document[:max_chars], model_id, deadline, cancel_token)
+            for document in documents
+        ]
+        try:
+            vectors = np.asarray([future.result() for future in futures], dtype=np.float32)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return _normalize_rows(vectors)
+
+
+def tfidf_embeddings(documents, max_features=4096, dimensions=128, max_df=0.9,
+                     max_chars=20000, seed=0, batch_rows=2048):
+    """
+    Embed documents locally with TF-IDF reduced by truncated SVD.
+
+    The TF-IDF matrix is kept sparse (CSR arrays) and only expanded to
+    dense a batch of rows at a time inside the SVD, so memory stays
+    proportional to the number of terms actually used.
+
+    Args:
+        documents (list): Document texts
+        max_features (int): Vocabulary size (most frequent terms kept)
+        dimensions (int): Output dimensions after SVD
+        max_df (float): Terms in more than this fraction of documents are
+            dropped, which removes stop words without a word list
+        max_chars (int): Characters of each document used
+        seed (int): Random seed for the randomized SVD
+        batch_rows (int): Rows expanded to dense at a time
+
+    Returns:
+        numpy.ndarray: One L2-normalized row per document
+    """
+    n_docs = len(documents)
+    document_frequency = Counter()
+    for document in documents:
+        document_frequency.update(set(TOKEN_PATTERN.findall(document[:max_chars].lower())))
+
+    limit = max(1, int(max_df * n_docs)) if n_docs > 2 else n_docs
+    terms = [term for term, count in document_frequency.items() if count <= limit]
+    terms.sort(key=lambda term: -document_frequency[term])
+    terms = terms[:max_features]
+    index = {term: column for column, term in enumerate(terms)}
+    if not index:
+        return np.zeros((n_docs, 1), dtype=np.float32)
+
+    # Sublinear TF weighted by smoothed IDF, one L2-normalized CSR row per document
+    idf = np.array([math.log((1 + n_docs) / (1 + document_frequency[term])) + 1 for term in terms],
+                   dtype=np.float32)
+    indptr = np.zeros(n_docs + 1, dtype=np.int64)
+    indices = []
+    data = []
+    for row, document in enumerate(documents):
+        counts = Counter(token for token in TOKEN_PATTERN.findall(document[:max_chars].lower())
+                         if token in index)
+        indptr[row + 1] = indptr[row] + len(counts)
+        if counts:
+            columns = np.fromiter((index[token] for token in counts), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            values = (1.0 + np.log(values)) * idf[columns]
+            values /= np.linalg.norm(values)
+            indices.append(columns)
+            data.append(values)
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+    data = np.concatenate(data) if data else np.zeros(0, dtype=np.float32)
+
+    def row_batches():
+        return _csr_row_batches(indptr, indices, data, len(terms), batch_rows)
+
+    rank = min(dimensions, n_docs - 1, len(terms) - 1)
+    if rank < 1:
+        return np.concatenate([block for _, block in row_batches()])
+    return _normalize_rows(_randomized_svd(row_batches, (n_docs, len(terms)), rank, seed))
+
+
+def _csr_row_batches(indptr, indices, data, n_columns, batch_rows):
+    """Yield (first row, dense block) pairs covering a CSR matrix."""
+    n_rows = len(indptr) - 1
+    for start in range(0, n_rows, batch_rows):
+        stop = min(n_rows, start + batch_rows)
+        block = np.zeros((stop - start, n_columns), dtype=np.float32)
+        low, high = indptr[start], indptr[stop]
+        rows = np.repeat(np.arange(stop - start), np.diff(indptr[start:stop + 1]))
+        block[rows, indices[low:high]] = data[low:high]
+        yield start, block
+
+
+def _randomized_svd(row_batches, shape, rank, seed, oversample=10, power_iterations=2):
+    """
+    Project rows onto the top singular directions (Halko et al.).
+
+    The matrix is only read through row_batches(), which yields
+    (first row, dense block) pairs, so it is never dense all at once.
+    """
+    n_rows, n_columns = shape
+
+    def times(right):
+        product = np.empty((n_rows, right.shape[1]), dtype=np.float32)
+        for start, block in row_batches():
+            product[start:start + len(block)] = block @ right
+        return product
+
+    def transpose_times(left):
+        product = np.zeros((n_columns, left.shape[1]), dtype=np.float32)
+        for start, block in row_batches():
+            product += block.T @ left[start:start + len(block)]
+        return product
+
+    rng = np.random.default_rng(seed)
+    probe = rng.standard_normal((n_columns, rank + oversample)).astype(np.float32)
+    basis, _ = np.linalg.qr(times(probe))
+    for _ in range(power_iterations):
+        basis, _ = np.linalg.qr(transpose_times(basis))
+        basis, _ = np.linalg.qr(times(basis))
+    left, singular, _ = np.linalg.svd(transpose_times(basis).T, full_matrices=False)
+    return (basis @ left[:, :rank]) * singular[:rank]
+
+
+def _normalize_rows(matrix):
+    """Scale rows to unit length, leaving all-zero rows alone."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def embed_documents(documents, summarizer=None, method='auto', timeout=None, cancel_token=None):
+    """
+    Embed documents with Bedrock, falling back to the local vectorizer.
+
+    Args:
+        documents (list): Document texts
+        summarizer (BedrockSummarizer): Needed for Bedrock embeddings
+        method (str): 'bedrock', 'local', or 'auto' (Bedrock if a
+            summarizer is given, local if that fails)
+        timeout (float or Deadline): Time budget for Bedrock embeddings
+        cancel_token (CancellationToken): Token to stop the remaining work
+
+    Returns:
+        numpy.ndarray: One L2-normalized row per document
+
+    Raises:
+        DeadlineExceeded: If the time budget runs out
+        SummaryCancelled: If the token is cancelled
+    """
+    if method == 'local' or summarizer is None:
+        return tfidf_embeddings(documents)
+    try:
+        return bedrock_embeddings(summarizer, documents, timeout=timeout, cancel_token=cancel_token)
+    except (SummaryCancelled, DeadlineExceeded):
+        raise
+    except Exception:
+        if method == 'bedrock':
+            raise
+        return tfidf_embeddings(documents)
+
+
+def _squared_distances(points, centers, block_size=4096):
+    """Squared Euclidean distances between every point and every center."""
+    center_norms = (centers ** 2).sum(axis=1)
+    distances = np.empty((points.shape[0], centers.shape[0]), dtype=np.float32)
+    for start in range(0, points.shape[0], block_size):
+        block = points[start:start + block_size]
+        distances[start:start + block_size] = (
+            (block ** 2).sum(axis=1)[:, None] - 2.0 * block @ centers.T + center_norms[None, :]
+        )
+    return np.maximum(distances, 0.0, out=distances)
+
+
+def _kmeans_plus_plus(points, n_clusters, rng):
+    """Pick spread-out initial centers with k-means++ seeding."""
+    centers = np.empty((n_clusters, points.shape[1]), dtype=points.dtype)
+    centers[0] = points[rng.integers(len(points))]
+    closest = _squared_distances(points, centers[:1])[:, 0]
+    for k in range(1, n_clusters):
+        weights = closest.astype(np.float64)
+        total = weights.sum()
+        if total <= 0:
+            choice = rng.integers(len(points))
+        else:
+            choice = rng.choice(len(points), p=weights / total)
+        centers[k] = points[choice]
+        closest = np.minimum(closest, _squared_distances(points, centers[k:k + 1])[:, 0])
+    return centers
+
+
+def kmeans(points, n_clusters, max_iter=100, batch_size=None, tol=1e-4, seed=0):
+    """
+    Cluster points with vectorized k-means, or mini-batch k-means.
+
+    Args:
+        points (numpy.ndarray): One row per document
+        n_clusters (int): Number of clusters
+        max_iter (int): Iterations (full passes, or mini-batches)
+        batch_size (int): Use mini-batch k-means with batches of this size
+            when it is smaller than the number of points
+        tol (float): Stop when centers move less than this (full k-means)
+        seed (int): Random seed
+
+    Returns:
+        tuple: (labels, centers) - cluster index per point, and centers
+    """
+    rng = np.random.default_rng(seed)
+    points = np.asarray(points, dtype=np.float32)
+    n_clusters = max(1, min(n_clusters, len(points)))
+    centers = _kmeans_plus_plus(points, n_clusters, rng)
+
+    if batch_size and batch_size < len(points):
+        seen = np.zeros(n_clusters, dtype=np.float64)
+        for _ in range(max_iter):
+            batch = points[rng.choice(len(points), batch_size, replace=False)]
+            labels = _squared_distances(batch, centers).argmin(axis=1)
+            counts = np.bincount(labels, minlength=n_clusters)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, labels, batch)
+            seen += counts
+            moved = counts > 0
+            # Per-center learning rate 1 / (points seen so far)
+            rate = (counts[moved] / seen[moved]).astype(np.float32)[:, None]
+            centers[moved] = (1 - rate) * centers[moved] + rate * sums[moved] / counts[moved, None]
+        labels = _squared_distances(points, centers).argmin(axis=1)
+        return labels, centers
+
+    for _ in range(max_iter):
+        distances = _squared_distances(points, centers)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, points)
+        updated = centers.copy()
+        filled = counts > 0
+        updated[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters with the points farthest from their center
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            farthest = distances[np.arange(len(points)), labels].argsort()[::-1][:len(empty)]
+            updated[empty] = points[farthest]
+        shift = np.abs(updated - centers).max()
+        centers = updated
+        if shift < tol:
+            break
+    labels = _squared_distances(points, centers).argmin(axis=1)
+    return labels, centers
+
+
+def representatives(points, labels, centers, per_cluster=5):
+    """
+    Find the members closest to each cluster center.
+
+    Returns:
+        dict: Cluster index -> list of document indices, closest first
+    """
+    chosen = {}
+    for cluster in range(len(centers)):
+        members = np.flatnonzero(labels == cluster)
+        if not len(members):
+            continue
+        distances = _squared_distances(points[members], centers[cluster:cluster + 1])[:, 0]
+        chosen[cluster] = members[np.argsort(distances)[:per_cluster]].tolist()
+    return chosen
+
+
+def summarize_corpus(summarizer, documents, n_clusters=None, samples_per_cluster=5,
+                     embedding='auto', excerpt_chars=2000, batch_size=None,
+                     timeout=None, cancel_token=None, seed=0):
+    """
+    Summarize what a collection of documents says, by topic.
+
+    Documents are embedded and clustered; a few members nearest each
+    cluster center are summarized together, and the cluster summaries are
+    rolled up into one corpus summary. This makes n_clusters + 1 model
+    calls no matter how many documents there are (plus one embedding call
+    per document when Bedrock embeddings are used).
+
+    Args:
+        summarizer (BedrockSummarizer): Summarizer used for model calls
+        documents (list): Document texts
+        n_clusters (int): Number of topics (default: about sqrt(n / 2), max 20)
+        samples_per_cluster (int): Representative documents per cluster
+        embedding (str): 'auto', 'bedrock', or 'local'
+        excerpt_chars (int): Characters of each representative sent to the model
+        batch_size (int): Use mini-batch k-means with this batch size
+        timeout (float or Deadline): Time budget for all model calls,
+            embeddings included
+        cancel_token (CancellationToken): Token to stop the remaining work
+        seed (int): Random seed for clustering
+
+    Returns:
+        dict: 'summary' for the whole corpus, 'labels' (cluster per
+            document), and 'clusters', each with 'size', 'representatives'
+            (document indices) and 'summary'
+    """
+    if not documents:
+        raise Exception("No documents to summarize")
+    deadline = Deadline.coerce(timeout)
+    if n_clusters is None:
+        n_clusters = min(20, max(1, int(round(math.sqrt(len(documents) / 2)))))
+
+    points = embed_documents(documents, summarizer, embedding, deadline, cancel_token)
+    if batch_size is None and len(documents) > 10000:
+        batch_size = 1024
+    labels, centers = kmeans(points, n_clusters, batch_size=batch_size, seed=seed)
+    chosen = representatives(points, labels, centers, samples_per_cluster)
+    sizes = np.bincount(labels, minlength=len(centers))
+
+    clusters = []
+    for cluster, members in sorted(chosen.items(), key=lambda item: -sizes[item[0]]):
+        excerpts = [documents[index][:excerpt_chars] for index in members]
+        clusters.append({
+            'cluster': cluster,
+            'size': int(sizes[cluster]),
+            'representatives': members,
+            'summary': summarizer.summarize_documents(excerpts, 'medium', deadline, cancel_token)
+        })
+
+    if len(clusters) == 1:
+        overall = clusters[0]['summary']
+    else:
+        topics = [f"(Topic covering {item['size']} of {len(documents)} documents) {item['summary']}"
+                  for item in clusters]
+        overall = summarizer.summarize_documents(topics, 'long', deadline, cancel_token)
+
+    return {
+        'summary': overall,
+        'labels': labels.tolist(),
+        'clusters': clusters
+    }
@@ -0,0 +1,125 @@
+"""
+Amazon Bedrock Content Summarizer - Deadlines
+Deadlines, cancellation and latency tracking shared by every pipeline step.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class SummaryCancelled(Exception):
+    """Raised when a caller cancels a summarization request."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a summarization request runs out of time."""
+
+
+class QuotaExceeded(Exception):
+    """Raised when a tenant's token or request budget is exhausted."""
+
+
+class CancellationToken:
+    """Cooperative cancellation flag shared between a caller and the pipeline."""
+
+    def __init__(self):
+        """Initialize an uncancelled token."""
+        self._event = threading.Event()
+
+    def cancel(self):
+        """Ask all work holding this token to stop."""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        """Whether cancel() has been called."""
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        """Raise SummaryCancelled if the token has been cancelled."""
+        if self._event.is_set():
+            raise SummaryCancelled("Summarization was cancelled")
+
+    def sleep(self, seconds):
+        """Sleep for up to seconds, waking early if the token is cancelled."""
+        self._event.wait(seconds)
+
+
+class Deadline:
+    """Absolute time budget shared by every step of a request."""
+
+    def __init__(self, seconds):
+        """
+        Start a deadline.
+
+        Args:
+            seconds (float): Time budget from now, in seconds
+        """
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def coerce(cls, timeout):
+        """
+        Turn a timeout argument into a Deadline.
+
+        Args:
+            timeout: None, a number of seconds, or a Deadline
+
+        Returns:
+            Deadline: The deadline, or None if there is no time limit
+        """
+        if timeout is None or isinstance(timeout, Deadline):
+            return timeout
+        return cls(timeout)
+
+    def remaining(self):
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        """Whether the deadline has passed."""
+        return self.remaining() <= 0
+
+
+class LatencyTracker:
+    """Tracks recent model call latencies per (model, length) key."""
+
+    def __init__(self, window=200, min_samples=20):
+        """
+        Initialize the tracker.
+
+        Args:
+            window (int): Number of recent samples kept per key
+            min_samples (int): Samples required before a percentile is reported
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        """Record one observed latency in seconds."""
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, key, pct):
+        """
+        Get a latency percentile for a key.
+
+        Args:
+            key (tuple): (model_id, length_type)
+            pct (float): Percentile between 0 and 100
+
+        Returns:
+            float: Latency in seconds, or None if there are too few samples
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
@@ -0,0 +1,195 @@
+"""
+Amazon Bedrock Content Summarizer - Ingestion
+Streaming readers for large (optionally gzip-compressed) text inputs.
+"""
+
+import codecs
+import mmap
+import os
+import re
+import zlib
+
+
+CHUNK_SIZE = 1 << 20
+GZIP_MAGIC = b'\x1f\x8b'
+LINE_BREAKS = '\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+SENTENCE_END = re.compile(r'[.!?]["\')\]]*\s+')
+
+
+def _iter_raw(source, chunk_size):
+    """Yield raw byte blocks from a path (memory-mapped) or binary file object."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(0, size, chunk_size):
+                    yield mapped[offset:offset + chunk_size]
+    else:
+        while True:
+            block = source.read(chunk_size)
+            if not block:
+                return
+            yield block
+
+
+def _gunzip(blocks):
+    """Inflate gzip data incrementally, including multi-member files."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for block in blocks:
+        while block:
+            data = decompressor.decompress(block)
+            if data:
+                yield data
+            block = decompressor.unused_data
+            if decompressor.eof:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                block = b''
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def iter_text(source, encoding='utf-8', errors='strict', chunk_size=CHUNK_SIZE):
+    """
+    Stream decoded text from a file without reading it all into memory.
+
+    Files on disk are memory-mapped; file objects (e.g. Streamlit uploads)
+    are read from their current position in chunks. Gzip input is detected
+    from its magic bytes and inflated on the fly.
+
+    Args:
+        source: Path to a file, or a binary file object
+        encoding (str): Text encoding
+        errors (str): Decoding error handler
+        chunk_size (int): Bytes read per step
+
+    Yields:
+        str: Decoded text chunks
+    """
+    blocks = _iter_raw(source, chunk_size)
+    first = b''
+    for block in blocks:
+        first += block
+        if len(first) >= len(GZIP_MAGIC):
+            break
+    if not first:
+        return
+
+    def chained():
+        yield first
+        yield from blocks
+
+    raw = _gunzip(chained()) if first[:2] == GZIP_MAGIC else chained()
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    for block in raw:
+        text = decoder.decode(block)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_slices(text, chunk_size=CHUNK_SIZE):
+    """Yield fixed-size slices of an in-memory string."""
+    for offset in range(0, len(text), chunk_size):
+        yield text[offset:offset + chunk_size]
+
+
+def iter_sentence_chunks(chunks, max_chars=12000):
+    """
+    Regroup a text stream into sentence-aligned chunks, lazily.
+
+    Each chunk ends at the last sentence boundary before max_chars, falling
+    back to whitespace and then a hard cut for text without punctuation.
+
+    Args:
+        chunks: Iterable of text pieces, e.g. from iter_text()
+        max_chars (int): Maximum characters per chunk
+
+    Yields:
+        str: Stripped, non-empty chunks of at most max_chars characters
+    """
+    buffer = ''
+    for piece in chunks:
+        buffer += piece
+        pos = 0
+        while len(buffer) - pos > max_chars:
+            window = buffer[pos:pos + max_chars]
+            cut = 0
+            for match in SENTENCE_END.finditer(window):
+                cut = match.end()
+            if cut == 0:
+                cut = window.rfind(' ') + 1 or max_chars
+            chunk = window[:cut].strip()
+            if chunk:
+                yield chunk
+            pos += cut
+        buffer = buffer[pos:]
+    chunk = buffer.strip()
+    if chunk:
+        yield chunk
+
+
+def iter_chunks(source, max_chars=12000, encoding='utf-8'):
+    """Stream sentence-aligned chunks straight from a file or file object."""
+    return iter_sentence_chunks(iter_text(source, encoding=encoding), max_chars)
+
+
+def stream_text_stats(chunks):
+    """
+    Count characters, words and lines in one pass over a text stream.
+
+    The counts match len(text), len(text.split()) and len(text.splitlines())
+    on the joined text, but only one chunk is held in memory at a time.
+
+    Args:
+        chunks: Iterable of text pieces
+
+    Returns:
+        dict: Statistics including character count, word count, etc.
+    """
+    characters = words = breaks = 0
+    last = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        characters += len(chunk)
+        words += len(chunk.split())
+        if last and not last.isspace() and not chunk[0].isspace():
+            words -= 1  # a word spans the chunk boundary
+        breaks += sum(1 for line in chunk.splitlines(True) if line[-1] in LINE_BREAKS)
+        if last == '\r' and chunk[0] == '\n':
+            breaks -= 1  # '\r\n' split across chunks is a single line break
+        last = chunk[-1]
+    lines = breaks + (1 if last and last not in LINE_BREAKS else 0)
+    return {
+        'characters': characters,
+        'words': words,
+        'lines': lines
+    }
+
+
+def preview_text(source, limit=5000, encoding='utf-8'):
+    """
+    Read only the beginning of a file for display.
+
+    Args:
+        source: Path to a file, or a binary file object
+        limit (int): Maximum characters to return
+        encoding (str): Text encoding
+
+    Returns:
+        tuple: (str, bool) - (preview text, whether the input was longer)
+    """
+    pieces = []
+    size = 0
+    for chunk in iter_text(source, encoding=encoding, errors='replace', chunk_size=64 * 1024):
+        pieces.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return ''.join(pieces)[:limit], True
+    return ''.join(pieces), False
@@ -5,76 +5,274 @@ Core functionality for text summarization using Amazon Bedrock.
 
 import os
 import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 
+from deadlines import (CancellationToken, Deadline, DeadlineExceeded, LatencyTracker,
+                       QuotaExceeded, SummaryCancelled)
+from ingestion import iter_sentence_chunks, iter_slices, stream_text_stats
+from summary_store import text_hash
+
+
+# Summary parameters per length (sentences are the target range the length
+# calibrator measures against)
+LENGTH_PARAMS = {
+    'short': {
+        'description': '2-3 sentences that capture the main point',
+        'max_tokens': 150,
+        'sentences': (2, 3)
+    },
+    'medium': {
+        'description': '1 paragraph (4-6 sentences) covering key points',
+        'max_tokens': 300,
+        'sentences': (4, 6)
+    },
+    'long': {
+        'description': 'multiple paragraphs with comprehensive details',
+        'max_tokens': 600,
+        'sentences': (6, 15)
+    }
+}
+
+
+# Default model for Bedrock text embeddings
+EMBEDDING_MODEL_ID = 'amazon.titan-embed-text-v2:0'
+
+# Read timeouts (seconds) that deadline-bound clients are rounded up to, so
+# only a handful of clients are ever created per region
+TIMEOUT_BUCKETS = (5, 15, 30, 60)
+
+# Bedrock errors worth retrying with backoff
+RETRYABLE_ERRORS = {
+    'ThrottlingException',
+    'ServiceUnavailableException',
+    'InternalServerException',
+    'ModelNotReadyException'
+}
+
 
 class BedrockSummarizer:
     """Handles text summarization using Amazon Bedrock."""
     
-    def __init__(self, region='us-east-1', model_id='anthropic.claude-3-haiku-20240307-v1:0'):
+    def __init__(self, region='us-east-1', model_id='anthropic.claude-3-haiku-20240307-v1:0',
+                 hedge=False, hedge_percentile=95, hedge_regions=None, hedge_budget=0.05, hedge_burst=2,
+                 scheduler=None, tenant='default', priority='interactive', store=None,
+                 calibrator=None, max_concurrency=None, read_timeout=60, max_attempts=4):
         """
         Initialize Bedrock client.
         
         Args:
             region (str): AWS region for Bedrock
             model_id (str): Bedrock model ID to use
+            hedge (bool): Send a duplicate request when a call runs past the
+                tracked latency percentile; the first response wins
+            hedge_percentile (float): Latency percentile that triggers a hedge
+            hedge_regions (list): Regions to send hedges to, round-robin
+                (defaults to the primary region)
+            hedge_budget (float): Hedges earned per request; the budget
+                refills by this much with every request
+            hedge_burst (float): Most hedges that can be saved up, so a calm
+                period cannot fund a flood of hedges during an outage
+            scheduler (FairScheduler): Shared scheduler that admits model calls
+            tenant (str): Tenant charged for this summarizer's calls
+            priority (str): 'interactive' or 'batch'
+            store (SummaryStore): Archive that every generated summary is
+                appended to
+            calibrator (LengthCalibrator): Tunes max_tokens and stop
+                sequences from observed output lengths
+            max_concurrency (int): Model calls expected in flight at once
+                across all users of this summarizer (defaults to the
+                scheduler's limit, or 8); sizes the worker pool
+            read_timeout (float): Upper bound on any single model call, so
+                abandoned hedge losers release their worker
+            max_attempts (int): Attempts per call when Bedrock throttles or
+                fails transiently, as long as the deadline leaves room
         """
         self.region = region
         self.model_id = model_id
         self.bedrock_runtime = None
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_regions = list(hedge_regions or [region])
+        self.hedge_budget = hedge_budget
+        self.hedge_burst = hedge_burst
+        self.scheduler = scheduler
+        self.tenant = tenant
+        self.priority = priority
+        self.store = store
+        self.calibrator = calibrator
+        if max_concurrency is None:
+            max_concurrency = scheduler.max_concurrency if scheduler is not None else 8
+        self.max_concurrency = max_concurrency
+        self.read_timeout = read_timeout
+        self.max_attempts = max_attempts
+        self.latency = LatencyTracker()
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._requests = 0
+        self._hedges_sent = 0
+        self._hedge_wins = 0
+        self._hedge_tokens = 0.0
+        self._hedge_region_turn = 0
         self._initialize_client()
     
     def _initialize_client(self):
         """Create Bedrock runtime client."""
+        self.bedrock_runtime = self._client_for(self.region)
+    
+    def _client_for(self, region, deadline=None):
+        """
+        Get (or lazily create) the Bedrock runtime client for a region.
+        
+        Every client's read timeout is capped at self.read_timeout. With a
+        deadline, it is the remaining budget rounded up to the next of
+        TIMEOUT_BUCKETS, so there are at most a few clients per region.
+        botocore's own retries are off: _call_model retries with backoff
+        while the deadline leaves room.
+        """
+        read_timeout = self.read_timeout
+        if deadline is not None:
+            remaining = deadline.remaining()
+            bucket = next((seconds for seconds in TIMEOUT_BUCKETS if seconds >= remaining), read_timeout)
+            read_timeout = min(read_timeout, bucket)
+        cache_key = (region, read_timeout)
+        client = self._clients.get(cache_key)
+        if client is not None:
+            return client
+        
+        # Created outside the lock: building a client is slow, and a
+        # duplicate created by a racing thread is simply discarded
         try:
-            self.bedrock_runtime = boto3.client(
+            client = boto3.client(
                 service_name='bedrock-runtime',
-                region_name=self.region
+                region_name=region,
+                config=Config(
+                    read_timeout=read_timeout,
+                    connect_timeout=min(read_timeout, 5),
+                    retries={'max_attempts': 0}
+                )
             )
         except NoCredentialsError:
             raise Exception("AWS credentials not found. Please configure them first.")
         except Exception as e:
             raise Exception(f"Failed to initialize Bedrock client: {str(e)}")
+        with self._lock:
+            return self._clients.setdefault(cache_key, client)
     
-    def generate_summary(self, text, length_type='medium'):
+    def generate_summary(self, text, length_type='medium', timeout=None, cancel_token=None, doc_id=None):
         """
         Generate a summary of specified length.
         
         Args:
             text (str): The text to summarize
             length_type (str): 'short', 'medium', or 'long'
+            timeout (float or Deadline): Time budget for the call
+            cancel_token (CancellationToken): Token to stop waiting early
+            doc_id (str): Document ID recorded with the summary in the store
         
         Returns:
             str: The generated summary
+        
+        Raises:
+            DeadlineExceeded: If the time budget runs out, or is too small
+                for this length based on observed latencies
+            SummaryCancelled: If the token is cancelled
+            QuotaExceeded: If the scheduler rejects the tenant's request
         """
-        # Define summary parameters
-        length_params = {
-            'short': {
-                'description': '2-3 sentences that capture the main point',
-                'max_tokens': 150
-            },
-            'medium': {
-                'description': '1 paragraph (4-6 sentences) covering key points',
-                'max_tokens': 300
-            },
-            'long': {
-                'description': 'multiple paragraphs with comprehensive details',
-                'max_tokens': 600
-            }
-        }
+        result = self._complete(self._summary_prompt(text, length_type), length_type,
+                                timeout, cancel_token, calibrated=True)
+        if self.store is not None:
+            self.store.append(
+                doc_id=doc_id,
+                text_hash=text_hash(text),
+                model=self.model_id,
+                length=length_type,
+                summary=result['summary'],
+                input_tokens=result['usage'].get('input_tokens', 0),
+                output_tokens=result['usage'].get('output_tokens', 0),
+                latency_ms=result['latency_ms']
+            )
+        return result['summary']
+    
+    def _summary_prompt(self, text, length_type, calibrated=True):
+        """Build the prompt that asks for one summary of a text."""
+        params = LENGTH_PARAMS.get(length_type, LENGTH_PARAMS['medium'])
+        return f"""Please provide a {length_type} summary of the following text. 
+The summary should be {params['description']}.{self._output_format(length_type, calibrated)}
+
+Text to summarize:
+{text}
+
+Summary:"""
+    
+    def _output_format(self, length_type, calibrated=True):
+        """Prompt line asking for the tags the calibrator's stop sequence relies on."""
+        if self.calibrator is None:
+            return ''
+        if not calibrated:
+            return '\n' + self.calibrator.format_instruction
+        return '\n' + self.calibrator.instructions(self.model_id, length_type)
+    
+    def summarize_documents(self, documents, length_type='medium', timeout=None, cancel_token=None):
+        """
+        Generate one summary of what several documents say together.
         
-        params = length_params.get(length_type, length_params['medium'])
+        Args:
+            documents (list): Document texts (or excerpts)
+            length_type (str): 'short', 'medium', or 'long'
+            timeout (float or Deadline): Time budget for the call
+            cancel_token (CancellationToken): Token to stop waiting early
+        
+        Returns:
+            str: The generated summary
+        """
+        params = LENGTH_PARAMS.get(length_type, LENGTH_PARAMS['medium'])
+        excerpts = "\n\n".join(
+            f"Document {number}:\n{document}" for number, document in enumerate(documents, 1)
+        )
         
         # Construct prompt
-        prompt = f"""Please provide a {length_type} summary of the following text. 
-The summary should be {params['description']}.
+        prompt = f"""Please provide a {length_type} summary of what the following {len(documents)} documents say together.
+Focus on the themes they share and note important differences between them.
+The summary should be {params['description']}.{self._output_format(length_type, calibrated=False)}
 
-Text to summarize:
-{text}
+{excerpts}
 
 Summary:"""
         
+        return self._complete(prompt, length_type, timeout, cancel_token)['summary']
+    
+    def _complete(self, prompt, length_type, timeout=None, cancel_token=None, calibrated=False):
+        """
+        Send a summarization prompt to the model.
+        
+        Args:
+            prompt (str): The full prompt
+            length_type (str): 'short', 'medium', or 'long'
+            timeout (float or Deadline): Time budget for the call
+            cancel_token (CancellationToken): Token to stop waiting early
+            calibrated (bool): Use the calibrated max_tokens and record the
+                output for calibration; only single-text summaries do, so
+                digests and corpus summaries do not skew the statistics
+        
+        Returns:
+            dict: 'summary' text, Bedrock 'usage', 'stop_reason' and
+                'latency_ms'
+        """
+        deadline = Deadline.coerce(timeout)
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        if not self._can_finish(length_type, deadline):
+            raise DeadlineExceeded(f"Not enough time left for a {length_type} summary")
+        
+        params = LENGTH_PARAMS.get(length_type, LENGTH_PARAMS['medium'])
+        
         # Prepare request body for Claude 3
         request_body = {
             "anthropic_version": "bedrock-2023-05-31",
@@ -89,21 +287,45 @@ Summary:"""
             "top_p": 0.9
         }
         
+        # Calibrated output length: tuned max_tokens, and a stop sequence that
+        # ends generation as soon as the summary is complete
+        if self.calibrator is not None:
+            tuned = self.calibrator.request_params(self.model_id, length_type)
+            if calibrated:
+                request_body['max_tokens'] = tuned['max_tokens']
+            request_body['stop_sequences'] = tuned['stop_sequences']
+            request_body['messages'].append({
+                "role": "assistant",
+                "content": tuned['prefill']
+            })
+        
         try:
             # Invoke the model
-            response = self.bedrock_runtime.invoke_model(
-                modelId=self.model_id,
-                contentType='application/json',
-                accept='application/json',
-                body=json.dumps(request_body)
-            )
-            
-            # Parse response
-            response_body = json.loads(response['body'].read())
+            start = time.monotonic()
+            response_body = self._invoke(request_body, length_type, deadline, cancel_token)
             summary = response_body['content'][0]['text'].strip()
             
-            return summary
+            if self.calibrator is not None and not calibrated:
+                summary = self.calibrator.finish(summary, response_body.get('stop_reason'))
+            elif self.calibrator is not None:
+                summary = self.calibrator.record(
+                    self.model_id,
+                    length_type,
+                    summary,
+                    response_body.get('usage', {}).get('output_tokens', 0),
+                    response_body.get('stop_reason'),
+                    request_body['max_tokens']
+                )
             
+            return {
+                'summary': summary,
+                'usage': response_body.get('usage', {}),
+                'stop_reason': response_body.get('stop_reason'),
+                'latency_ms': (time.monotonic() - start) * 1000
+            }
+            
+        except (SummaryCancelled, DeadlineExceeded, QuotaExceeded):
+            raise
         except ClientError as e:
             error_code = e.response['Error']['Code']
             error_msg = e.response['Error']['Message']
@@ -111,28 +333,506 @@ Summary:"""
         except KeyError as e:
             raise Exception(f"Unexpected response format: {str(e)}")
         except Exception as e:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded(f"Timed out generating {length_type} summary: {str(e)}")
             raise Exception(f"Failed to generate summary: {str(e)}")
     
-    def summarize_all_lengths(self, text):
+    def _can_finish(self, length_type, deadline):
+        """Whether the median observed latency for this length fits the deadline."""
+        if deadline is None:
+            return True
+        if deadline.expired():
+            return False
+        typical = self.latency.percentile((self.model_id, length_type), 50)
+        return typical is None or typical <= deadline.remaining()
+    
+    def embed_text(self, text, model_id=EMBEDDING_MODEL_ID, timeout=None, cancel_token=None):
+        """
+        Embed a text with a Bedrock embedding model.
+        
+        The call goes through the same path as summaries: the scheduler
+        (charged for the input tokens), deadline, cancellation, retries and
+        hedging.
+        
+        Args:
+            text (str): Text to embed
+            model_id (str): Bedrock embedding model ID
+            timeout (float or Deadline): Time budget for the call
+            cancel_token (CancellationToken): Token to stop waiting early
+        
+        Returns:
+            list: The embedding vector
+        """
+        deadline = Deadline.coerce(timeout)
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        if self._deadline_passed(deadline):
+            raise DeadlineExceeded("Not enough time left for an embedding")
+        
+        try:
+            response_body = self._invoke({"inputText": text}, 'embedding', deadline, cancel_token,
+                                         model_id=model_id, estimated_tokens=len(text) // 4 + 1)
+            return response_body['embedding']
+        except (SummaryCancelled, DeadlineExceeded, QuotaExceeded):
+            raise
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            error_msg = e.response['Error']['Message']
+            raise Exception(f"Bedrock API Error ({error_code}): {error_msg}")
+        except KeyError as e:
+            raise Exception(f"Unexpected response format: {str(e)}")
+        except Exception as e:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded(f"Timed out embedding text: {str(e)}")
+            raise Exception(f"Failed to embed text: {str(e)}")
+    
+    def _invoke(self, request_body, length_type, deadline=None, cancel_token=None,
+                model_id=None, estimated_tokens=None):
+        """
+        Invoke the model, hedging the call if it runs unusually long.
+        
+        With a scheduler, a slot is acquired first. The slot is released by
+        whichever thread finishes the HTTP call, so it stays held (and is
+        charged) even when the caller stops waiting early. Hedges only run
+        if a slot is free right now, and hold their own.
+        
+        Args:
+            request_body (dict): Request body for invoke_model
+            length_type (str): Summary length (or 'embedding'), used as the
+                latency key
+            deadline (Deadline): Time budget for the call
+            cancel_token (CancellationToken): Token to stop waiting early
+            model_id (str): Model to call (defaults to self.model_id)
+            estimated_tokens (int): Expected tokens, charged to the scheduler
+                until the actual usage is known (defaults to an estimate
+                from the messages and max_tokens)
+        
+        Returns:
+            dict: Parsed response body
+        """
+        model_id = model_id or self.model_id
+        key = (model_id, length_type)
+        body = json.dumps(request_body)
+        if estimated_tokens is None:
+            estimated_tokens = sum(len(message['content']) for message in request_body['messages']) // 4 \
+                + request_body['max_tokens']
+        ticket = None
+        if self.scheduler is not None:
+            ticket = self.scheduler.acquire(self.tenant, self.priority, estimated_tokens,
+                                            deadline, cancel_token)
+        try:
+            threshold = None
+            if self.hedge:
+                with self._lock:
+                    self._requests += 1
+                    self._hedge_tokens = min(self.hedge_burst, self._hedge_tokens + self.hedge_budget)
+                threshold = self.latency.percentile(key, self.hedge_percentile)
+            
+            client = self.bedrock_runtime
+            if deadline is not None:
+                client = self._client_for(self.region, deadline)
+        except BaseException:
+            self._release(ticket)
+            raise
+        
+        if threshold is None and deadline is None and cancel_token is None:
+            return self._call_model(client, model_id, body, key, ticket=ticket)
+        return self._call_hedged(model_id, body, client, key, ticket, estimated_tokens,
+                                 threshold, deadline, cancel_token)
+    
+    def _release(self, ticket, usage=None):
+        """Return a scheduler slot, if one was taken."""
+        if ticket is not None:
+            self.scheduler.release(ticket, usage)
+    
+    def _call_model(self, client, model_id, body, latency_key=None, deadline=None, cancel_token=None,
+                    ticket=None):
+        """
+        Send one invoke_model request and parse the response body.
+        
+        Throttling and transient server errors are retried with exponential
+        backoff and full jitter, up to max_attempts, but only while the
+        backoff still fits before the deadline and the token is not
+        cancelled.
+        
+        The successful attempt is timed from when it actually starts (not
+        from when it was queued in the worker pool). Only primary requests
+        pass latency_key, so hedges never feed the percentile that triggers
+        them, and an abandoned primary still records how long it really took.
+        The scheduler ticket, if any, is released here with the actual usage.
+        """
+        usage = None
+        try:
+            response_body = self._call_with_retries(client, model_id, body, latency_key,
+                                                    deadline, cancel_token)
+            usage = response_body.get('usage')
+            if usage is None and 'inputTextTokenCount' in response_body:
+                # Embedding models report only their input tokens
+                usage = {'input_tokens': response_body['inputTextTokenCount'], 'output_tokens': 0}
+            return response_body
+        finally:
+            self._release(ticket, usage)
+    
+    def _call_with_retries(self, client, model_id, body, latency_key, deadline, cancel_token):
+        """Send invoke_model, retrying throttling and transient errors."""
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.monotonic()
+            try:
+                response = client.invoke_model(
+                    modelId=model_id,
+                    contentType='application/json',
+                    accept='application/json',
+                    body=body
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] not in RETRYABLE_ERRORS or attempt == self.max_attempts:
+                    raise
+                backoff = random.uniform(0, min(8.0, 0.25 * 2 ** attempt))
+                if deadline is not None and backoff >= deadline.remaining():
+                    raise
+                if cancel_token is not None:
+                    cancel_token.sleep(backoff)
+                    cancel_token.raise_if_cancelled()
+                else:
+                    time.sleep(backoff)
+                continue
+            response_body = json.loads(response['body'].read())
+            if latency_key is not None:
+                self.latency.record(latency_key, time.monotonic() - start)
+            return response_body
+    
+    def _call_hedged(self, model_id, body, client, latency_key, ticket=None, estimated_tokens=1,
+                     threshold=None, deadline=None, cancel_token=None):
+        """
+        Run a call in the worker pool and wait for it cooperatively.
+        
+        If threshold is set and the call is still pending after it, a
+        duplicate is sent. Whichever request succeeds first wins; the other
+        one is abandoned and its result discarded. Waiting stops early when
+        the deadline passes or the token is cancelled.
+        """
+        executor = self._get_executor()
+        hedge = None
+        try:
+            primary = executor.submit(self._call_model, client, model_id, body, latency_key,
+                                      deadline, cancel_token, ticket)
+        except BaseException:
+            self._release(ticket)
+            raise
+        pending = {primary}
+        if threshold is not None:
+            done, pending = self._wait_any(pending, threshold, deadline, cancel_token)
+            if not done and not self._deadline_passed(deadline):
+                hedge = self._send_hedge(executor, model_id, body, estimated_tokens, deadline, cancel_token)
+                if hedge is not None:
+                    pending = pending | {hedge}
+            pending = done | pending
+        
+        error = None
+        while pending:
+            done, pending = self._wait_any(pending, None, deadline, cancel_token)
+            if not done:
+                raise DeadlineExceeded("Deadline passed while waiting for the model")
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self._hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+    
+    def _wait_any(self, futures, timeout, deadline, cancel_token):
+        """
+        Wait until one future finishes, the timeout or deadline passes, or
+        the token is cancelled.
+        
+        Returns:
+            tuple: (done, pending) sets of futures
+        """
+        if deadline is not None:
+            remaining = deadline.remaining()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            step = 0.1 if cancel_token is not None else None
+            if end is not None:
+                left = end - time.monotonic()
+                if left <= 0:
+                    return set(), set(futures)
+                step = left if step is None else min(step, left)
+            done, pending = wait(futures, timeout=step, return_when=FIRST_COMPLETED)
+            if done:
+                return done, pending
+    
+    @staticmethod
+    def _deadline_passed(deadline):
+        """Whether a (possibly missing) deadline has passed."""
+        return deadline is not None and deadline.expired()
+    
+    def _send_hedge(self, executor, model_id, body, estimated_tokens, deadline, cancel_token):
+        """
+        Submit a duplicate request if the hedge budget and scheduler allow it.
+        
+        Returns:
+            Future: The hedge, or None if none was sent
+        """
+        if not self._reserve_hedge():
+            return None
+        ticket = None
+        if self.scheduler is not None:
+            ticket = self.scheduler.try_acquire(self.tenant, self.priority, estimated_tokens)
+            if ticket is None:
+                self._refund_hedge()
+                return None
+        try:
+            hedge_client = self._client_for(self._next_hedge_region(), deadline)
+            return executor.submit(self._call_model, hedge_client, model_id, body, None,
+                                   deadline, cancel_token, ticket)
+        except BaseException:
+            self._refund_hedge()
+            self._release(ticket)
+            raise
+    
+    def _reserve_hedge(self):
+        """
+        Take one hedge from the token bucket, if a whole one is available.
+        
+        The bucket gains hedge_budget per request and holds at most
+        hedge_burst, so hedges stay near hedge_budget of recent traffic.
+        """
+        with self._lock:
+            if self._hedge_tokens < 1:
+                return False
+            self._hedge_tokens -= 1
+            self._hedges_sent += 1
+            return True
+    
+    def _refund_hedge(self):
+        """Return a reserved hedge that was not sent."""
+        with self._lock:
+            self._hedge_tokens = min(self.hedge_burst, self._hedge_tokens + 1)
+            self._hedges_sent -= 1
+    
+    def _next_hedge_region(self):
+        """Pick the region for the next hedge, round-robin."""
+        with self._lock:
+            region = self.hedge_regions[self._hedge_region_turn % len(self.hedge_regions)]
+            self._hedge_region_turn += 1
+            return region
+    
+    def _get_executor(self):
+        """
+        Get the worker pool used for hedged and cancellable calls.
+        
+        It has room for a primary and a hedge per expected concurrent call,
+        so calls are not left waiting in the pool's queue.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=2 * self.max_concurrency,
+                    thread_name_prefix='bedrock-call'
+                )
+            return self._executor
+    
+    def hedge_stats(self):
+        """
+        Get hedging counters.
+        
+        Returns:
+            dict: Requests seen, hedges sent, and how many hedges won
+        """
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'hedges_sent': self._hedges_sent,
+                'hedge_wins': self._hedge_wins
+            }
+    
+    def summarize_all_lengths(self, text, timeout=None, cancel_token=None, doc_id=None):
         """
         Generate short, medium, and long summaries.
         
         Args:
             text (str): The text to summarize
+            timeout (float or Deadline): Time budget for all three summaries
+            cancel_token (CancellationToken): Token to stop the remaining work
+            doc_id (str): Document ID recorded with the summaries in the store
         
         Returns:
             dict: Dictionary with 'short', 'medium', and 'long' summaries
         """
-        summaries = {}
+        if timeout is None and cancel_token is None:
+            summaries = {}
+            
+            for length in ['short', 'medium', 'long']:
+                try:
+                    summaries[length] = self.generate_summary(text, length, doc_id=doc_id)
+                except Exception as e:
+                    summaries[length] = f"Error: {str(e)}"
+            
+            return summaries
+        
+        return self._flatten(self.summarize_within(text, timeout, cancel_token, doc_id))
+    
+    @staticmethod
+    def _flatten(results):
+        """Turn summarize_within results into one string per length."""
+        return {
+            length: result['summary'] if result['status'] == 'ok'
+            else f"{result['status'].capitalize()}: {result['error']}"
+            for length, result in results.items()
+        }
+    
+    @staticmethod
+    def _failure_status(error):
+        """The summarize_within status for an exception from a model call."""
+        if isinstance(error, SummaryCancelled):
+            return 'cancelled'
+        if isinstance(error, DeadlineExceeded):
+            return 'timeout'
+        if isinstance(error, QuotaExceeded):
+            return 'rejected'
+        return 'error'
+    
+    def summarize_within(self, text, timeout=None, cancel_token=None, doc_id=None):
+        """
+        Best-effort summaries within a time budget.
+        
+        Lengths are tried in order (short, medium, long). A length is skipped
+        when its typical latency no longer fits the remaining budget, so the
+        caller gets whatever finished in time.
+        
+        Args:
+            text (str): The text to summarize
+            timeout (float or Deadline): Time budget, e.g. 3 for "within 3s"
+            cancel_token (CancellationToken): Token to stop the remaining work
+            doc_id (str): Document ID recorded with the summaries in the store
+        
+        Returns:
+            dict: Per length, a dict with 'status' ('ok', 'skipped',
+                'timeout', 'cancelled', 'rejected' or 'error'), 'summary', 'error' and
+                'elapsed' seconds
+        """
+        deadline = Deadline.coerce(timeout)
+        results = {}
         
         for length in ['short', 'medium', 'long']:
-            try:
-                summaries[length] = self.generate_summary(text, length)
-            except Exception as e:
-                summaries[length] = f"Error: {str(e)}"
+            start = time.monotonic()
+            status, summary, error = 'ok', None, None
+            if cancel_token is not None and cancel_token.cancelled:
+                status, error = 'cancelled', "Summarization was cancelled"
+            elif not self._can_finish(length, deadline):
+                status, error = 'skipped', "Not enough time left"
+            else:
+                try:
+                    summary = self.generate_summary(text, length, deadline, cancel_token, doc_id)
+                except Exception as e:
+                    status, error = self._failure_status(e), str(e)
+            results[length] = {
+                'status': status,
+                'summary': summary,
+                'error': error,
+                'elapsed': time.monotonic() - start
+            }
         
-        return summaries
-
+        return results
+    
+    def summarize_stream(self, chunks, max_chars=12000, timeout=None, cancel_token=None, doc_id=None):
+        """
+        Summarize input too large for one prompt, chunk by chunk.
+        
+        Args:
+            chunks: Iterable of sentence-aligned text chunks, e.g. from
+                ingestion.iter_chunks()
+            max_chars (int): Chunk size used when digests need regrouping
+            timeout (float or Deadline): Time budget for the whole document
+            cancel_token (CancellationToken): Token to stop the remaining work
+            doc_id (str): Document ID recorded with the final summaries
+        
+        Returns:
+            dict: Dictionary with 'short', 'medium', and 'long' summaries
+        """
+        return self._flatten(self.summarize_stream_within(chunks, max_chars, timeout, cancel_token, doc_id))
+    
+    def summarize_stream_within(self, chunks, max_chars=12000, timeout=None, cancel_token=None,
+                                doc_id=None):
+        """
+        Best-effort summaries of a chunked document within a time budget.
+        
+        Each sentence-aligned chunk is condensed to a medium digest as it
+        arrives, so only the digests are kept in memory; digests are not
+        archived in the store. The digests are then summarized at all three
+        lengths with summarize_within(). Input that fits in a single chunk
+        is summarized directly.
+        
+        If the budget runs out, the token is cancelled, or a call fails
+        while digesting, every length gets that status instead of an
+        exception. If regrouping the digests would not reduce their number
+        (digests longer than about half of max_chars), the joined digests
+        are summarized as they are.
+        
+        Args:
+            chunks: Iterable of sentence-aligned text chunks, e.g. from
+                ingestion.iter_chunks()
+            max_chars (int): Chunk size used when digests need regrouping;
+                must fit at least two medium digests
+            timeout (float or Deadline): Time budget for the whole document
+            cancel_token (CancellationToken): Token to stop the remaining work
+            doc_id (str): Document ID recorded with the final summaries
+        
+        Returns:
+            dict: Per length, a dict with 'status', 'summary', 'error' and
+                'elapsed' seconds, as from summarize_within()
+        
+        Raises:
+            ValueError: If max_chars is too small to regroup digests
+        """
+        # A medium digest can be up to max_tokens * ~4 characters long
+        min_chars = 2 * 4 * LENGTH_PARAMS['medium']['max_tokens']
+        if max_chars < min_chars:
+            raise ValueError(f"max_chars must be at least {min_chars} to fit two medium digests")
+        deadline = Deadline.coerce(timeout)
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        second = next(chunks, None)
+        if first is None:
+            raise Exception("No text to summarize")
+        if second is None:
+            return self.summarize_within(first, deadline, cancel_token, doc_id)
+        
+        def remaining():
+            yield first
+            yield second
+            yield from chunks
+        
+        def digest(chunk):
+            prompt = self._summary_prompt(chunk, 'medium', calibrated=False)
+            return self._complete(prompt, 'medium', deadline, cancel_token)['summary']
+        
+        start = time.monotonic()
+        try:
+            digests = [digest(chunk) for chunk in remaining()]
+            while len(digests) > 1 and sum(len(text) for text in digests) > max_chars:
+                groups = list(iter_sentence_chunks(iter(['\n\n'.join(digests)]), max_chars))
+                if len(groups) >= len(digests):
+                    break  # another pass would not shrink the digests
+                digests = [digest(group) for group in groups]
+        except Exception as e:
+            status, error = self._failure_status(e), str(e)
+            return {
+                length: {
+                    'status': status,
+                    'summary': None,
+                    'error': error,
+                    'elapsed': time.monotonic() - start
+                }
+                for length in ['short', 'medium', 'long']
+            }
+        return self.summarize_within('\n\n'.join(digests), deadline, cancel_token, doc_id)
 
 def validate_aws_credentials():
     """
@@ -148,16 +848,15 @@ def validate_aws_credentials():
 
 def get_text_stats(text):
     """
-    Get statistics about the text.
+    Get statistics about the text in a single streaming pass.
     
     Args:
-        text (str): The text to analyze
+        text (str or iterable): The text to analyze, or an iterable of text
+            chunks such as ingestion.iter_text(path)
     
     Returns:
         dict: Statistics including character count, word count, etc.
     """
-    return {
-        'characters': len(text),
-        'words': len(text.split()),
-        'lines': len(text.splitlines())
-    }
+    if isinstance(text, str):
+        text = iter_slices(text)
+    return stream_text_stats(text)
@@ -0,0 +1,374 @@
+"""
+Amazon Bedrock Content Summarizer - Scheduler
+Weighted fair queuing and per-tenant quotas for a shared Bedrock deployment.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from deadlines import DeadlineExceeded, QuotaExceeded
+
+
+PRIORITIES = ('interactive', 'batch')
+
+
+class Ticket:
+    """A request waiting for, or holding, a model invocation slot."""
+
+    def __init__(self, tenant, priority, cost, start_tag):
+        self.tenant = tenant
+        self.priority = priority
+        self.cost = cost
+        self.start_tag = start_tag
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.granted = False
+        self.abandoned = False
+        self.released = False
+        self.usage = None
+
+
+class FairScheduler:
+    """
+    Admits model invocations from several tenants onto a shared capacity.
+
+    Within a priority class, waiting requests are served by start-time fair
+    queuing: each tenant advances its own virtual clock by cost / weight, so
+    tenants receive tokens in proportion to their weights. Interactive work
+    is always dispatched before batch work, and batch work may never take
+    the slots reserved for interactive requests.
+
+    Token and request budgets are enforced per tenant over a rolling window,
+    using the actual usage reported in Bedrock responses.
+    """
+
+    def __init__(self, max_concurrency=4, interactive_reserve=1, window_seconds=60):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrency (int): Model calls allowed in flight at once
+            interactive_reserve (int): Slots that batch work may not use
+            window_seconds (float): Rolling window for tenant budgets
+        """
+        self.max_concurrency = max_concurrency
+        self.interactive_reserve = min(interactive_reserve, max_concurrency - 1)
+        self.window_seconds = window_seconds
+        self._cond = threading.Condition()
+        self._tenants = {}
+        self._queues = {priority: [] for priority in PRIORITIES}
+        self._virtual_time = {priority: 0.0 for priority in PRIORITIES}
+        self._in_flight = {priority: 0 for priority in PRIORITIES}
+        self._waits = {priority: deque(maxlen=1000) for priority in PRIORITIES}
+        self._seq = itertools.count()
+
+    def add_tenant(self, tenant, weight=1.0, token_budget=None, request_budget=None):
+        """
+        Register a tenant or update its settings.
+
+        Args:
+            tenant (str): Tenant name
+            weight (float): Share of capacity relative to other tenants
+            token_budget (int): Max input + output tokens per window
+            request_budget (int): Max requests per window
+        """
+        with self._cond:
+            state = self._tenant(tenant)
+            state['weight'] = float(weight)
+            state['token_budget'] = token_budget
+            state['request_budget'] = request_budget
+
+    def _tenant(self, tenant):
+        """Get a tenant's state, registering it with defaults if needed."""
+        state = self._tenants.get(tenant)
+        if state is None:
+            state = self._tenants[tenant] = {
+                'weight': 1.0,
+                'token_budget': None,
+                'request_budget': None,
+                'finish_tags': {priority: 0.0 for priority in PRIORITIES},
+                'history': deque(),
+                'reserved_tokens': 0,
+                'reserved_requests': 0,
+                'metrics': {
+                    'admitted': 0,
+                    'opportunistic': 0,
+                    'completed': 0,
+                    'rejected_requests': 0,
+                    'rejected_tokens': 0,
+                    'budget_overruns': 0,
+                    'input_tokens': 0,
+                    'output_tokens': 0,
+                    'wait_seconds': 0.0,
+                    'max_wait_seconds': 0.0
+                }
+            }
+        return state
+
+    def _window_usage(self, state, now):
+        """Requests and tokens a tenant has used within the rolling window."""
+        history = state['history']
+        while history and history[0][0] < now - self.window_seconds:
+            history.popleft()
+        return len(history), sum(tokens for _, tokens in history)
+
+    def _exceeded_budget(self, state, estimated_tokens):
+        """Which budget ('requests' or 'tokens') admitting this request breaks, if any."""
+        requests, tokens = self._window_usage(state, time.monotonic())
+        if state['request_budget'] is not None and \
+                requests + state['reserved_requests'] >= state['request_budget']:
+            return 'requests'
+        if state['token_budget'] is not None and \
+                tokens + state['reserved_tokens'] + estimated_tokens > state['token_budget']:
+            return 'tokens'
+        return None
+
+    def _check_budget(self, state, estimated_tokens):
+        """Raise QuotaExceeded if admitting this request breaks a budget."""
+        exceeded = self._exceeded_budget(state, estimated_tokens)
+        metrics = state['metrics']
+        if exceeded == 'requests':
+            metrics['rejected_requests'] += 1
+            raise QuotaExceeded(f"Request budget of {state['request_budget']} per "
+                                f"{self.window_seconds:g}s exhausted")
+        if exceeded == 'tokens':
+            metrics['rejected_tokens'] += 1
+            raise QuotaExceeded(f"Token budget of {state['token_budget']} per "
+                                f"{self.window_seconds:g}s exhausted")
+
+    def _reserve(self, state, tenant, priority, cost):
+        """Charge a new ticket's estimate to the tenant (caller holds the lock)."""
+        start_tag = max(self._virtual_time[priority], state['finish_tags'][priority])
+        state['finish_tags'][priority] = start_tag + cost / state['weight']
+        state['reserved_tokens'] += cost
+        state['reserved_requests'] += 1
+        return Ticket(tenant, priority, cost, start_tag)
+
+    def acquire(self, tenant, priority='interactive', estimated_tokens=1,
+                deadline=None, cancel_token=None):
+        """
+        Wait for an invocation slot.
+
+        Args:
+            tenant (str): Tenant making the request
+            priority (str): 'interactive' or 'batch'
+            estimated_tokens (int): Expected input + output tokens
+            deadline (Deadline): Give up waiting when this passes
+            cancel_token (CancellationToken): Give up waiting when cancelled
+
+        Returns:
+            Ticket: Pass it to release() when the call finishes
+
+        Raises:
+            QuotaExceeded: If the tenant's budget does not allow the request
+            DeadlineExceeded: If no slot frees up before the deadline
+            SummaryCancelled: If the token is cancelled while waiting
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        cost = max(1, int(estimated_tokens))
+        with self._cond:
+            state = self._tenant(tenant)
+            self._check_budget(state, cost)
+            ticket = self._reserve(state, tenant, priority, cost)
+            heapq.heappush(self._queues[priority], (ticket.start_tag, next(self._seq), ticket))
+            self._dispatch()
+
+            try:
+                while not ticket.granted:
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    timeout = 0.1 if cancel_token is not None else None
+                    if deadline is not None:
+                        if deadline.expired():
+                            raise DeadlineExceeded("Deadline passed while queued for a model slot")
+                        remaining = deadline.remaining()
+                        timeout = remaining if timeout is None else min(timeout, remaining)
+                    self._cond.wait(timeout)
+            except BaseException:
+                if ticket.granted:
+                    self._finish(ticket, None)
+                else:
+                    ticket.abandoned = True
+                    state['reserved_tokens'] -= cost
+                    state['reserved_requests'] -= 1
+                    state['finish_tags'][priority] -= cost / state['weight']
+                raise
+
+            waited = ticket.started_at - ticket.enqueued_at
+            metrics = state['metrics']
+            metrics['admitted'] += 1
+            metrics['wait_seconds'] += waited
+            metrics['max_wait_seconds'] = max(metrics['max_wait_seconds'], waited)
+            self._waits[priority].append(waited)
+            return ticket
+
+    def try_acquire(self, tenant, priority='interactive', estimated_tokens=1):
+        """
+        Take a slot only if one is free right now, without waiting.
+
+        Meant for optional work such as hedged requests: it never jumps
+        ahead of queued requests of the same or a higher priority, never
+        breaks a budget, and a refusal is not counted as a rejection.
+
+        Args:
+            tenant (str): Tenant making the request
+            priority (str): 'interactive' or 'batch'
+            estimated_tokens (int): Expected input + output tokens
+
+        Returns:
+            Ticket: Pass it to release() when the call finishes, or None if
+                no slot could be taken
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        cost = max(1, int(estimated_tokens))
+        with self._cond:
+            ahead = PRIORITIES[:PRIORITIES.index(priority) + 1]
+            if any(not ticket.abandoned for level in ahead for *_, ticket in self._queues[level]):
+                return None
+            state = self._tenant(tenant)
+            if self._capacity(priority) <= 0 or self._exceeded_budget(state, cost):
+                return None
+            ticket = self._reserve(state, tenant, priority, cost)
+            self._virtual_time[priority] = max(self._virtual_time[priority], ticket.start_tag)
+            self._in_flight[priority] += 1
+            ticket.granted = True
+            ticket.started_at = ticket.enqueued_at
+            state['metrics']['admitted'] += 1
+            state['metrics']['opportunistic'] += 1
+            return ticket
+
+    def release(self, ticket, usage=None):
+        """
+        Return a slot and charge the tenant for what the call used.
+
+        Releasing a ticket twice has no effect, so the code that finishes
+        the call can always release it.
+
+        Args:
+            ticket (Ticket): Ticket from acquire() or try_acquire()
+            usage (dict): Bedrock 'usage' block with input_tokens and
+                output_tokens, or None if the call failed
+        """
+        with self._cond:
+            self._finish(ticket, usage)
+
+    def _finish(self, ticket, usage):
+        """Release a granted ticket (caller holds the lock)."""
+        if ticket.released:
+            return
+        ticket.released = True
+        state = self._tenant(ticket.tenant)
+        metrics = state['metrics']
+        state['reserved_tokens'] -= ticket.cost
+        state['reserved_requests'] -= 1
+        self._in_flight[ticket.priority] -= 1
+
+        tokens = 0
+        if usage:
+            metrics['input_tokens'] += usage.get('input_tokens', 0)
+            metrics['output_tokens'] += usage.get('output_tokens', 0)
+            tokens = usage.get('input_tokens', 0) + usage.get('output_tokens', 0)
+            # Correct the tenant's virtual clock from the estimate to actual cost
+            state['finish_tags'][ticket.priority] += (tokens - ticket.cost) / state['weight']
+        metrics['completed'] += 1
+        state['history'].append((time.monotonic(), tokens))
+
+        _, used = self._window_usage(state, time.monotonic())
+        if state['token_budget'] is not None and used > state['token_budget']:
+            metrics['budget_overruns'] += 1
+        self._dispatch()
+
+    def _capacity(self, priority):
+        """Slots a priority class may still take."""
+        busy = sum(self._in_flight.values())
+        limit = self.max_concurrency
+        if priority == 'batch':
+            limit -= self.interactive_reserve
+        return limit - busy
+
+    def _dispatch(self):
+        """Grant slots to the next tickets in fair order (caller holds the lock)."""
+        granted = False
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue and self._capacity(priority) > 0:
+                start_tag, _, ticket = heapq.heappop(queue)
+                if ticket.abandoned:
+                    continue
+                self._virtual_time[priority] = max(self._virtual_time[priority], start_tag)
+                self._in_flight[priority] += 1
+                ticket.granted = True
+                ticket.started_at = time.monotonic()
+                granted = True
+        if granted:
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tenant, priority='interactive', estimated_tokens=1,
+             deadline=None, cancel_token=None):
+        """
+        Hold a slot for the duration of a with block.
+
+        Set ticket.usage inside the block to charge actual token usage.
+        """
+        ticket = self.acquire(tenant, priority, estimated_tokens, deadline, cancel_token)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket, ticket.usage)
+
+    def metrics(self):
+        """
+        Get fairness and budget metrics.
+
+        Returns:
+            dict: Per-tenant counters and token share vs. weight share,
+                per-priority queue wait p50/p95, and Jain's fairness index
+                over weight-normalized token usage
+        """
+        with self._cond:
+            total_weight = sum(state['weight'] for state in self._tenants.values()) or 1.0
+            total_tokens = sum(state['metrics']['input_tokens'] + state['metrics']['output_tokens']
+                               for state in self._tenants.values())
+            tenants = {}
+            normalized = []
+            for name, state in self._tenants.items():
+                metrics = dict(state['metrics'])
+                tokens = metrics['input_tokens'] + metrics['output_tokens']
+                metrics['weight_share'] = state['weight'] / total_weight
+                metrics['token_share'] = tokens / total_tokens if total_tokens else 0.0
+                requests, window_tokens = self._window_usage(state, time.monotonic())
+                metrics['window_requests'] = requests
+                metrics['window_tokens'] = window_tokens
+                tenants[name] = metrics
+                if metrics['completed']:
+                    normalized.append(tokens / state['weight'])
+
+            waits = {}
+            for priority, samples in self._waits.items():
+                ordered = sorted(samples)
+                waits[priority] = {
+                    'queued': sum(1 for *_, ticket in self._queues[priority] if not ticket.abandoned),
+                    'in_flight': self._in_flight[priority],
+                    'p50_wait_seconds': _percentile(ordered, 50),
+                    'p95_wait_seconds': _percentile(ordered, 95)
+                }
+
+            fairness = None
+            if normalized and any(normalized):
+                fairness = sum(normalized) ** 2 / (len(normalized) * sum(x * x for x in normalized))
+
+            return {'tenants': tenants, 'priorities': waits, 'fairness_index': fairness}
+
+
+def _percentile(ordered, pct):
+    """Percentile of an already sorted list, or None if it is empty."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
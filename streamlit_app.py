@@ -5,7 +5,16 @@ Interactive web interface for text summarization.
 
 import streamlit as st
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from deadlines import CancellationToken, SummaryCancelled
 from main import BedrockSummarizer, validate_aws_credentials, get_text_stats
+from ingestion import iter_chunks, iter_text, preview_text
+from calibration import LengthCalibrator
+
+
+PREVIEW_CHARS = 5000
+CALIBRATION_FILE = 'calibration.jsonl'
 
 
 # Page configuration
@@ -53,6 +62,50 @@ def initialize_session_state():
         st.session_state.summaries = None
     if 'input_text' not in st.session_state:
         st.session_state.input_text = ""
+    if 'cancel_token' not in st.session_state:
+        st.session_state.cancel_token = None
+
+
+def cancel_running_job():
+    """Cancel the summarization started by an earlier run of this script, if any."""
+    token = st.session_state.cancel_token
+    if token is not None:
+        token.cancel()
+        st.session_state.cancel_token = None
+
+
+def run_cancellable(job, token, status):
+    """
+    Run a summarization job in the background and wait for it.
+    
+    The script thread polls instead of blocking, so when Streamlit stops
+    this run (a rerun or a closed tab) the stop is raised here and the
+    token is cancelled rather than the job running on unobserved.
+    """
+    future = get_job_pool().submit(job)
+    start = time.monotonic()
+    try:
+        while not future.done():
+            status.caption(f"Generating summaries... {time.monotonic() - start:.0f}s")
+            time.sleep(0.2)
+        return future.result()
+    finally:
+        if not future.done():
+            token.cancel()
+        status.empty()
+
+
+@st.cache_resource
+def get_job_pool():
+    """Get the shared pool that summarization jobs run in."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix='summarize-job')
+
+
+@st.cache_resource
+def get_summarizer(region, model, hedge, calibrate):
+    """Get a shared summarizer so latency and length history survive reruns."""
+    calibrator = LengthCalibrator(CALIBRATION_FILE) if calibrate else None
+    return BedrockSummarizer(region=region, model_id=model, hedge=hedge, calibrator=calibrator)
 
 
 def main():
@@ -86,6 +139,29 @@ def main():
             help="Haiku: Fast & economical | Sonnet: Balanced | Opus: Best quality"
         )
         
+        # Tail latency
+        hedge = st.checkbox(
+            "Hedge slow requests",
+            value=False,
+            help="Send a duplicate request when a call runs past its p95 latency"
+        )
+        
+        # Output length
+        calibrate = st.checkbox(
+            "Calibrate output length",
+            value=False,
+            help="Tune max_tokens and stop sequences from observed summary lengths"
+        )
+        
+        # Time budget
+        time_budget = st.number_input(
+            "Time budget (seconds)",
+            min_value=0.0,
+            value=0.0,
+            step=1.0,
+            help="Best effort within this many seconds; lengths that can't finish are skipped. 0 = no limit"
+        )
+        
         st.divider()
         
         # AWS Credentials Check
@@ -123,6 +199,7 @@ def main():
         )
         
         input_text = ""
+        uploaded_file = None
         
         if input_method == "Type/Paste Text":
             input_text = st.text_area(
@@ -134,11 +211,15 @@ def main():
         elif input_method == "Upload File":
             uploaded_file = st.file_uploader(
                 "Choose a text file",
-                type=['txt', 'md']
+                type=['txt', 'md', 'gz']
             )
             if uploaded_file:
-                input_text = uploaded_file.read().decode('utf-8')
-                st.text_area("File content", input_text, height=300, disabled=True)
+                # Only a bounded preview is decoded for display
+                uploaded_file.seek(0)
+                preview, truncated = preview_text(uploaded_file, PREVIEW_CHARS)
+                if truncated:
+                    preview += "\n\n… (preview truncated)"
+                st.text_area("File content (preview)", preview, height=300, disabled=True)
         
         else:  # Use Sample
             try:
@@ -148,9 +229,15 @@ def main():
             except FileNotFoundError:
                 st.warning("Sample file not found. Please use another input method.")
         
+        has_input = bool(input_text) or uploaded_file is not None
+        
         # Text statistics
-        if input_text:
-            stats = get_text_stats(input_text)
+        if has_input:
+            if uploaded_file is not None:
+                uploaded_file.seek(0)
+                stats = get_text_stats(iter_text(uploaded_file, errors='replace'))
+            else:
+                stats = get_text_stats(input_text)
             col_a, col_b, col_c = st.columns(3)
             with col_a:
                 st.metric("Characters", f"{stats['characters']:,}")
@@ -164,18 +251,39 @@ def main():
             "🚀 Generate Summaries",
             type="primary",
             use_container_width=True,
-            disabled=not input_text or not is_valid
+            disabled=not has_input or not is_valid
         )
     
     with col2:
         st.header("✨ Summaries")
         
-        if summarize_btn and input_text:
+        # A rerun means the user moved on: stop any job the last run left behind
+        cancel_running_job()
+        
+        if summarize_btn and has_input:
+            token = CancellationToken()
+            st.session_state.cancel_token = token
             try:
-                with st.spinner("Generating summaries..."):
-                    summarizer = BedrockSummarizer(region=region, model_id=model)
-                    st.session_state.summaries = summarizer.summarize_all_lengths(input_text)
+                summarizer = get_summarizer(region, model, hedge, calibrate)
+                if uploaded_file is not None:
+                    uploaded_file.seek(0)
+                    job = lambda: summarizer.summarize_stream(
+                        iter_chunks(uploaded_file),
+                        timeout=time_budget or None,
+                        cancel_token=token
+                    )
+                else:
+                    job = lambda: summarizer.summarize_all_lengths(
+                        input_text,
+                        timeout=time_budget or None,
+                        cancel_token=token
+                    )
+                st.session_state.summaries = run_cancellable(job, token, st.empty())
+                st.session_state.cancel_token = None
                 st.success("✓ Summaries generated successfully!")
+            except SummaryCancelled:
+                st.warning("Summarization was cancelled")
+                st.session_state.summaries = None
             except Exception as e:
                 st.error(f"Error: {str(e)}")
                 st.session_state.summaries = None
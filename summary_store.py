@@ -0,0 +1,739 @@
+"""
+Amazon Bedrock Content Summarizer - Summary Store
+Compact, append-only columnar storage for generated summaries.
+
+A store is a directory of immutable segment files. Each segment holds one
+batch of rows split into row groups, with every column of every group
+compressed separately, plus a sorted index file keyed on text hash and
+document ID. Each segment footer also carries a bloom filter over the index
+keys, so lookups skip segments that cannot hold a match, binary-search the
+memory-mapped indexes of the rest and decode only the row group that holds
+the match.
+"""
+
+import array
+import base64
+import bisect
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+
+MAGIC = b'BSS1'
+SEGMENT_SUFFIX = '.bss'
+INDEX_SUFFIX = '.idx'
+COMPACT_LOCK = 'compact.lock'
+HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+INDEX_RECORD = struct.Struct('<16sI')
+FOOTER = struct.Struct('<I4s')
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 7
+# A directory modified this recently may change again within the same
+# timestamp tick, so its listing is not cached yet
+LISTING_SETTLE_NS = 1_000_000_000
+
+# Column name -> on-disk encoding
+COLUMNS = OrderedDict([
+    ('doc_id', 'str'),
+    ('text_hash', 'hash'),
+    ('model', 'dict'),
+    ('length', 'dict'),
+    ('summary', 'str'),
+    ('input_tokens', 'int'),
+    ('output_tokens', 'int'),
+    ('latency_ms', 'float'),
+    ('created_at', 'float'),
+])
+
+
+def text_hash(text):
+    """SHA-256 hex digest identifying an input text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _index_key(kind, value):
+    """Fixed-width index key for a text hash ('h') or document ID ('d')."""
+    return hashlib.blake2b(f'{kind}:{value}'.encode('utf-8'), digest_size=16).digest()
+
+
+def _bloom_positions(key, bits):
+    """Bit positions of an index key in a bloom filter (double hashing)."""
+    first = int.from_bytes(key[:8], 'little')
+    step = int.from_bytes(key[8:], 'little') | 1
+    return [(first + number * step) % bits for number in range(BLOOM_HASHES)]
+
+
+def _bloom_filter(keys):
+    """Bloom filter bytes for a list of index keys."""
+    bits = max(64, -(-len(keys) * BLOOM_BITS_PER_KEY // 8) * 8)
+    data = bytearray(bits // 8)
+    for key in keys:
+        for position in _bloom_positions(key, bits):
+            data[position >> 3] |= 1 << (position & 7)
+    return bytes(data)
+
+
+def _make_row(doc_id, text_hash, model, length, summary, input_tokens, output_tokens,
+              latency_ms, created_at):
+    """
+    Build a row, checking every value can be encoded.
+
+    Raises:
+        ValueError: Naming the first column with an invalid value
+    """
+    if not isinstance(text_hash, str) or not HASH_PATTERN.fullmatch(text_hash.lower()):
+        raise ValueError(f"text_hash must be a SHA-256 hex digest (64 hex characters), got {text_hash!r}")
+    row = {'doc_id': doc_id or '', 'text_hash': text_hash.lower()}
+    for name, value in (('doc_id', row['doc_id']), ('model', model), ('length', length),
+                        ('summary', summary)):
+        if not isinstance(value, str):
+            raise ValueError(f"{name} must be a string, got {type(value).__name__}")
+        try:
+            value.encode('utf-8')
+        except UnicodeEncodeError as e:
+            raise ValueError(f"{name} is not valid UTF-8 text: {e}")
+        row[name] = value
+    for name, value in (('input_tokens', input_tokens), ('output_tokens', output_tokens)):
+        try:
+            value = int(value or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be an integer, got {value!r}")
+        if not -2 ** 63 <= value < 2 ** 63:
+            raise ValueError(f"{name} is out of range: {value}")
+        row[name] = value
+    for name, value in (('latency_ms', latency_ms or 0.0),
+                        ('created_at', time.time() if created_at is None else created_at)):
+        try:
+            row[name] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number, got {value!r}")
+    return row
+
+
+def _little_endian(values):
+    """Array bytes in little-endian order regardless of platform."""
+    if sys.byteorder == 'big':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode, data):
+    """Inverse of _little_endian."""
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _encode_column(kind, values):
+    """Serialize one column's values to bytes (before compression)."""
+    if kind == 'str':
+        blobs = [value.encode('utf-8') for value in values]
+        lengths = _little_endian(array.array('I', [len(blob) for blob in blobs]))
+        return lengths + b''.join(blobs)
+    if kind == 'hash':
+        return b''.join(bytes.fromhex(value) for value in values)
+    if kind == 'dict':
+        dictionary = list(OrderedDict.fromkeys(values))
+        codes = {value: code for code, value in enumerate(dictionary)}
+        header = json.dumps(dictionary).encode('utf-8')
+        return struct.pack('<I', len(header)) + header + \
+            _little_endian(array.array('I', [codes[value] for value in values]))
+    if kind == 'int':
+        return _little_endian(array.array('q', values))
+    return _little_endian(array.array('d', values))
+
+
+def _decode_column(kind, data, rows):
+    """Deserialize one column from bytes."""
+    if kind == 'str':
+        lengths = _from_little_endian('I', data[:4 * rows])
+        values, offset = [], 4 * rows
+        for length in lengths:
+            values.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+        return values
+    if kind == 'hash':
+        return [data[offset:offset + 32].hex() for offset in range(0, 32 * rows, 32)]
+    if kind == 'dict':
+        (size,) = struct.unpack_from('<I', data)
+        dictionary = json.loads(data[4:4 + size].decode('utf-8'))
+        return [dictionary[code] for code in _from_little_endian('I', data[4 + size:])]
+    if kind == 'int':
+        return list(_from_little_endian('q', data))
+    return list(_from_little_endian('d', data))
+
+
+class _Segment:
+    """Read access to one segment file and its index."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            f.seek(-FOOTER.size, os.SEEK_END)
+            size, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != MAGIC:
+                raise Exception(f"Not a summary store segment: {path}")
+            f.seek(-FOOTER.size - size, os.SEEK_END)
+            footer = json.loads(f.read(size).decode('utf-8'))
+        self.rows = footer['rows']
+        self.group_rows = footer.get('group_rows', self.rows)
+        self.groups = footer.get('groups') or [{'rows': self.rows, 'columns': footer['columns']}]
+        self.replaces = footer.get('replaces', [])
+        # Segments written before bloom filters existed have none
+        self.bloom = base64.b64decode(footer['bloom']) if 'bloom' in footer else None
+        self._index = None
+
+    def may_contain(self, key):
+        """Whether the index can hold key; False means it certainly does not."""
+        if self.bloom is None:
+            return True
+        bits = len(self.bloom) * 8
+        return all(self.bloom[position >> 3] & (1 << (position & 7))
+                   for position in _bloom_positions(key, bits))
+
+    def read_group(self, number, names=None):
+        """Decode the requested columns (all by default) of one row group."""
+        group = self.groups[number]
+        names = list(names or COLUMNS)
+        columns = {}
+        with open(self.path, 'rb') as f:
+            for name in names:
+                offset, length = group['columns'][name]
+                f.seek(offset)
+                data = zlib.decompress(f.read(length))
+                columns[name] = _decode_column(COLUMNS[name], data, group['rows'])
+        return columns
+
+    @property
+    def index_open(self):
+        """Whether the index is currently memory-mapped."""
+        return self._index is not None
+
+    def find(self, key):
+        """Row numbers whose index key matches, using binary search."""
+        if self._index is None:
+            with open(self.path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, 'rb') as f:
+                self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index = self._index
+        count = len(index) // INDEX_RECORD.size
+
+        class _Keys:
+            def __len__(self):
+                return count
+
+            def __getitem__(self, position):
+                start = position * INDEX_RECORD.size
+                return index[start:start + 16]
+
+        rows = []
+        position = bisect.bisect_left(_Keys(), key)
+        while position < count:
+            found, row = INDEX_RECORD.unpack_from(index, position * INDEX_RECORD.size)
+            if found != key:
+                break
+            rows.append(row)
+            position += 1
+        return rows
+
+    def close(self):
+        """Release the memory-mapped index."""
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+
+class SummaryStore:
+    """
+    Persistent archive of summaries with indexed lookup.
+
+    Rows are buffered in memory and written as one compressed segment per
+    batch, so many threads can append cheaply. Separate processes can share
+    a directory: every writer creates its own uniquely named segments, only
+    one process compacts at a time (guarded by a lock file), and readers
+    skip segments that a compaction has replaced or removed.
+    """
+
+    def __init__(self, path, batch_size=1000, row_group_size=512, cache_groups=64,
+                 max_open_indexes=64, lock_timeout=3600):
+        """
+        Open (or create) a store.
+
+        Args:
+            path (str): Store directory
+            batch_size (int): Rows buffered before a segment is written
+            row_group_size (int): Rows per separately compressed row group;
+                a lookup decodes one group
+            cache_groups (int): Decoded row groups kept for repeat lookups
+            max_open_indexes (int): Segment indexes kept memory-mapped at
+                once; the least recently used are closed beyond this
+            lock_timeout (float): Seconds after which a compaction lock left
+                by a crashed process is broken
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.row_group_size = row_group_size
+        self.cache_groups = cache_groups
+        self.max_open_indexes = max_open_indexes
+        self.lock_timeout = lock_timeout
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._segments = {}
+        self._open_indexes = OrderedDict()
+        self._decoded = OrderedDict()
+        self._listing = None
+        self._seq = itertools.count()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, doc_id, text_hash, model, length, summary,
+               input_tokens=0, output_tokens=0, latency_ms=0.0, created_at=None):
+        """
+        Add one summary; it is written with the next full batch.
+
+        Args:
+            doc_id (str): Caller's document ID ('' if none)
+            text_hash (str): SHA-256 hex digest of the input text
+            model (str): Bedrock model ID
+            length (str): 'short', 'medium' or 'long'
+            summary (str): Generated summary
+            input_tokens (int): Input tokens reported by Bedrock
+            output_tokens (int): Output tokens reported by Bedrock
+            latency_ms (float): Call latency in milliseconds
+            created_at (float): Unix timestamp (defaults to now)
+
+        Raises:
+            ValueError: If a value cannot be stored; the row is not added,
+                so it never blocks the rest of the batch
+        """
+        row = _make_row(doc_id, text_hash, model, length, summary, input_tokens, output_tokens,
+                        latency_ms, created_at)
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._write_segment(self._buffer)
+                self._buffer = []
+
+    def flush(self):
+        """Write any buffered rows as a segment."""
+        with self._lock:
+            if self._buffer:
+                self._write_segment(self._buffer)
+                self._buffer = []
+
+    def close(self):
+        """Flush buffered rows and release open indexes."""
+        self.flush()
+        with self._lock:
+            for segment in self._open_indexes.values():
+                segment.close()
+            self._open_indexes.clear()
+            self._segments.clear()
+            self._decoded.clear()
+
+    def _write_segment(self, rows, replaces=()):
+        """
+        Write rows as a new segment and index (caller holds the lock).
+
+        Args:
+            rows (list): Row dicts
+            replaces (iterable): Names of segments this one supersedes
+        """
+        name = f"segment-{time.time_ns():020d}-{os.getpid()}-{next(self._seq)}"
+        base = os.path.join(self.path, name)
+        try:
+            self._write_files(base, rows, replaces)
+        except BaseException:
+            # Leave no half-written files behind for a failed write
+            for path in (base + SEGMENT_SUFFIX + '.tmp', base + INDEX_SUFFIX + '.tmp'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            raise
+
+    def _write_files(self, base, rows, replaces):
+        """Write the segment and index files for _write_segment."""
+        keys = []
+        for number, row in enumerate(rows):
+            keys.append((_index_key('h', row['text_hash']), number))
+            if row['doc_id']:
+                keys.append((_index_key('d', row['doc_id']), number))
+        keys.sort()
+
+        groups = []
+        offset = len(MAGIC)
+        with open(base + SEGMENT_SUFFIX + '.tmp', 'wb') as f:
+            f.write(MAGIC)
+            for start in range(0, len(rows), self.row_group_size):
+                group = rows[start:start + self.row_group_size]
+                blocks = {}
+                for column, kind in COLUMNS.items():
+                    data = zlib.compress(_encode_column(kind, [row[column] for row in group]), 6)
+                    f.write(data)
+                    blocks[column] = [offset, len(data)]
+                    offset += len(data)
+                groups.append({'rows': len(group), 'columns': blocks})
+            footer = json.dumps({
+                'rows': len(rows),
+                'group_rows': self.row_group_size,
+                'groups': groups,
+                'replaces': sorted(replaces),
+                'bloom': base64.b64encode(_bloom_filter([key for key, _ in keys])).decode('ascii')
+            }).encode('utf-8')
+            f.write(footer)
+            f.write(FOOTER.pack(len(footer), MAGIC))
+
+        with open(base + INDEX_SUFFIX + '.tmp', 'wb') as f:
+            for key, number in keys:
+                f.write(INDEX_RECORD.pack(key, number))
+
+        # The index goes live first, so a visible segment always has one
+        os.replace(base + INDEX_SUFFIX + '.tmp', base + INDEX_SUFFIX)
+        os.replace(base + SEGMENT_SUFFIX + '.tmp', base + SEGMENT_SUFFIX)
+        self._listing = None
+
+    def _segment_paths(self, refresh=False):
+        """
+        Paths of all complete segments, oldest first.
+
+        The listing is cached until the directory's modification time
+        changes, so repeat lookups cost one stat instead of a full scan.
+        """
+        mtime = os.stat(self.path).st_mtime_ns
+        if not refresh and self._listing is not None and self._listing[0] == mtime:
+            return list(self._listing[1])
+        paths = sorted(
+            entry.path for entry in os.scandir(self.path)
+            if entry.name.endswith(SEGMENT_SUFFIX)
+        )
+        settled = time.time_ns() - mtime >= LISTING_SETTLE_NS
+        self._listing = (mtime, paths) if settled else None
+        return list(paths)
+
+    def _live_segments(self):
+        """
+        Metadata of the segments readers should use, oldest first
+        (caller holds the lock).
+
+        Segments superseded by a compacted segment are left out even before
+        they are deleted. If a segment is deleted while listing, the
+        directory is listed again so its replacement is picked up.
+        """
+        for attempt in range(3):
+            paths = self._segment_paths(refresh=attempt > 0)
+            listed = set(paths)
+            for path in list(self._segments):
+                if path not in listed:
+                    self._forget(path)
+            segments = []
+            for path in paths:
+                try:
+                    segments.append(self._segment(path))
+                except FileNotFoundError:
+                    continue
+            if len(segments) == len(paths):
+                break
+        replaced = {name for segment in segments for name in segment.replaces}
+        return [segment for segment in segments if os.path.basename(segment.path) not in replaced]
+
+    def _segment(self, path):
+        """Open segment metadata (cached)."""
+        segment = self._segments.get(path)
+        if segment is None:
+            segment = self._segments[path] = _Segment(path)
+        return segment
+
+    def _forget(self, path):
+        """Drop cached state for a segment that is gone (caller holds the lock)."""
+        self._listing = None
+        segment = self._segments.pop(path, None)
+        if segment is not None:
+            segment.close()
+        self._open_indexes.pop(path, None)
+        for key in [key for key in self._decoded if key[0] == path]:
+            del self._decoded[key]
+
+    def _find(self, segment, key):
+        """Index lookup that keeps at most max_open_indexes mapped (caller holds the lock)."""
+        rows = segment.find(key)
+        self._open_indexes[segment.path] = segment
+        self._open_indexes.move_to_end(segment.path)
+        while len(self._open_indexes) > self.max_open_indexes:
+            _, evicted = self._open_indexes.popitem(last=False)
+            evicted.close()
+        return rows
+
+    def _rows(self, segment, numbers):
+        """Decode specific rows of a segment, one row group at a time, caching recent groups."""
+        rows = []
+        for group, members in itertools.groupby(sorted(numbers), key=lambda number: number // segment.group_rows):
+            cache_key = (segment.path, group)
+            columns = self._decoded.get(cache_key)
+            if columns is None:
+                columns = segment.read_group(group)
+                self._decoded[cache_key] = columns
+                if len(self._decoded) > self.cache_groups:
+                    self._decoded.popitem(last=False)
+            else:
+                self._decoded.move_to_end(cache_key)
+            first = group * segment.group_rows
+            rows.extend({name: columns[name][number - first] for name in COLUMNS} for number in members)
+        return rows
+
+    def _lookup(self, kind, value, field, attempts=3):
+        """
+        All rows (persisted and buffered) whose field matches value.
+
+        If a concurrent compaction removes a segment mid-lookup, the lookup
+        starts over so the rows are read from the merged segment instead.
+        """
+        key = _index_key(kind, value)
+        with self._lock:
+            for attempt in range(attempts):
+                found = []
+                vanished = False
+                for segment in self._live_segments():
+                    if not segment.may_contain(key):
+                        continue
+                    try:
+                        numbers = self._find(segment, key)
+                        if numbers:
+                            found.extend(row for row in self._rows(segment, numbers) if row[field] == value)
+                    except FileNotFoundError:
+                        self._forget(segment.path)
+                        vanished = True
+                if not vanished:
+                    break
+            found.extend(dict(row) for row in self._buffer if row[field] == value)
+            found.sort(key=lambda row: row['created_at'])
+            return found
+
+    def get_by_hash(self, text_hash, model=None, length=None):
+        """
+        Find stored summaries of a text.
+
+        Args:
+            text_hash (str): SHA-256 hex digest of the input text
+            model (str): Only return rows for this model
+            length (str): Only return rows for this length
+
+        Returns:
+            list: Matching rows as dicts, oldest first
+        """
+        return [
+            row for row in self._lookup('h', text_hash.lower(), 'text_hash')
+            if (model is None or row['model'] == model) and (length is None or row['length'] == length)
+        ]
+
+    def get_by_doc_id(self, doc_id):
+        """
+        Find stored summaries for a document ID.
+
+        Returns:
+            list: Matching rows as dicts, oldest first
+        """
+        return self._lookup('d', doc_id, 'doc_id')
+
+    def _groups(self, names):
+        """
+        Decode persisted rows one row group at a time.
+
+        Segments removed by a concurrent compaction are skipped.
+
+        Yields:
+            tuple: (row count, dict of column name -> values)
+        """
+        with self._lock:
+            segments = self._live_segments()
+        for segment in segments:
+            for number, group in enumerate(segment.groups):
+                try:
+                    yield group['rows'], segment.read_group(number, names)
+                except FileNotFoundError:
+                    break
+
+    def scan(self, columns=None):
+        """
+        Stream persisted rows one row group at a time.
+
+        Args:
+            columns (list): Column names to read (all by default); only
+                these columns are decompressed
+
+        Yields:
+            dict: One row
+        """
+        names = list(columns or COLUMNS)
+        for rows, data in self._groups(names):
+            for number in range(rows):
+                yield {name: data[name][number] for name in names}
+
+    def __len__(self):
+        """Number of persisted and buffered rows."""
+        with self._lock:
+            persisted = sum(segment.rows for segment in self._live_segments())
+            return persisted + len(self._buffer)
+
+    def export_jsonl(self, destination, columns=None):
+        """
+        Stream all persisted rows to a JSON Lines file.
+
+        Args:
+            destination (str): Output path
+            columns (list): Column names to export (all by default)
+
+        Returns:
+            int: Rows written
+        """
+        written = 0
+        with open(destination, 'w', encoding='utf-8') as f:
+            for row in self.scan(columns):
+                f.write(json.dumps(row, ensure_ascii=False))
+                f.write('\n')
+                written += 1
+        return written
+
+    def export_parquet(self, destination, columns=None):
+        """
+        Stream all persisted rows to a Parquet file, one row group per store row group.
+
+        Requires pyarrow (pip install pyarrow).
+
+        Args:
+            destination (str): Output path
+            columns (list): Column names to export (all by default)
+
+        Returns:
+            int: Rows written
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("Parquet export requires pyarrow. Install it with: pip install pyarrow")
+
+        names = list(columns or COLUMNS)
+        types = {'str': pa.string(), 'hash': pa.string(), 'dict': pa.dictionary(pa.int32(), pa.string()),
+                 'int': pa.int64(), 'float': pa.float64()}
+        schema = pa.schema([(name, types[COLUMNS[name]]) for name in names])
+        written = 0
+        with pq.ParquetWriter(destination, schema, compression='zstd') as writer:
+            for rows, data in self._groups(names):
+                arrays = []
+                for name in names:
+                    if COLUMNS[name] == 'dict':
+                        arrays.append(pa.array(data[name], type=pa.string()).dictionary_encode())
+                    else:
+                        arrays.append(pa.array(data[name], type=schema.field(name).type))
+                writer.write_table(pa.table(arrays, schema=schema))
+                written += rows
+        return written
+
+    def compact(self, target_rows=100000):
+        """
+        Merge small segments into larger ones to speed up lookups.
+
+        Only one process compacts a store at a time: the others find the
+        lock file taken and return without doing anything. Each merged
+        segment records which segments it replaces, so readers never see
+        both the originals and the merge.
+
+        Args:
+            target_rows (int): Merge runs of segments up to this many rows
+
+        Returns:
+            int: Segments merged away (0 if another process holds the lock)
+        """
+        if not self._acquire_compact_lock():
+            return 0
+        try:
+            with self._lock:
+                return self._compact(target_rows)
+        finally:
+            self._release_compact_lock()
+
+    def _compact(self, target_rows):
+        """Merge runs of small segments (caller holds both locks)."""
+        segments = [segment for segment in self._live_segments() if segment.rows < target_rows]
+        merged_away = 0
+        run, run_rows = [], 0
+        for segment in segments + [None]:
+            rows = segment.rows if segment else 0
+            if run and (segment is None or run_rows + rows > target_rows):
+                if len(run) > 1:
+                    merged = []
+                    for old in run:
+                        for number in range(len(old.groups)):
+                            columns = old.read_group(number)
+                            merged.extend({name: columns[name][row] for name in COLUMNS}
+                                          for row in range(old.groups[number]['rows']))
+                    replaces = {os.path.basename(old.path) for old in run}
+                    for old in run:
+                        replaces.update(old.replaces)
+                    self._write_segment(merged, replaces)
+                    for old in run:
+                        self._forget(old.path)
+                        for path in (old.path, old.path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX):
+                            try:
+                                os.remove(path)
+                            except FileNotFoundError:
+                                pass
+                    merged_away += len(run)
+                run, run_rows = [], 0
+            if segment:
+                run.append(segment)
+                run_rows += rows
+        return merged_away
+
+    def _acquire_compact_lock(self):
+        """
+        Take the store-wide compaction lock file, breaking it if its owner
+        has held it longer than lock_timeout.
+
+        Returns:
+            bool: Whether the lock was taken
+        """
+        path = os.path.join(self.path, COMPACT_LOCK)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    age = time.time() - os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue
+                if age < self.lock_timeout:
+                    return False
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'pid': os.getpid(), 'acquired_at': time.time()}, f)
+            return True
+        return False
+
+    def _release_compact_lock(self):
+        """Remove the compaction lock file."""
+        try:
+            os.remove(os.path.join(self.path, COMPACT_LOCK))
+        except FileNotFoundError:
+            pass
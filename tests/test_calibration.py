@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip('boto3')
+
+from calibration import LengthCalibrator, length_report
+
+
+def add_samples(calibrator, count, sentences, output_tokens, stop_reason='end_turn', max_tokens=300):
+    text = ' '.join('This is a sentence.' for _ in range(sentences))
+    for _ in range(count):
+        calibrator.record('model-a', 'medium', text, output_tokens, stop_reason, max_tokens)
+
+
+def test_defaults_until_enough_samples():
+    calibrator = LengthCalibrator(min_samples=5)
+    add_samples(calibrator, 4, sentences=5, output_tokens=100)
+    assert calibrator.max_tokens('model-a', 'medium') == 300
+    assert calibrator.instructions('model-a', 'medium') == calibrator.format_instruction
+
+
+def test_max_tokens_follows_p95_within_target():
+    calibrator = LengthCalibrator(min_samples=5)
+    add_samples(calibrator, 10, sentences=5, output_tokens=100)
+    assert calibrator.max_tokens('model-a', 'medium') == 120
+
+
+def test_overlong_outputs_are_capped_by_sentence_target():
+    calibrator = LengthCalibrator(min_samples=5)
+    # 10 sentences at 25 tokens each, against a 4-6 sentence target
+    add_samples(calibrator, 10, sentences=10, output_tokens=250)
+    assert calibrator.max_tokens('model-a', 'medium') == 180
+    assert 'no more than 6 sentences' in calibrator.instructions('model-a', 'medium')
+
+    # Truncation at the cap does not push the limit back up
+    add_samples(calibrator, 10, sentences=7, output_tokens=180, stop_reason='max_tokens', max_tokens=180)
+    assert calibrator.max_tokens('model-a', 'medium') == 180
+
+    report = length_report(list(calibrator._samples[('model-a', 'medium')]))
+    assert report['model-a/medium']['recommended_max_tokens'] == 173
+
+
+def test_truncated_output_is_trimmed_to_last_sentence():
+    calibrator = LengthCalibrator()
+    summary = calibrator.record('model-a', 'short', 'One sentence. And a cut', 50, 'max_tokens', 50)
+    assert summary == 'One sentence.'
@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+from deadlines import CancellationToken, Deadline, LatencyTracker, SummaryCancelled
+
+
+def test_deadline_coerce_and_expiry():
+    assert Deadline.coerce(None) is None
+    deadline = Deadline.coerce(0.05)
+    assert Deadline.coerce(deadline) is deadline
+    assert 0 < deadline.remaining() <= 0.05
+    time.sleep(0.06)
+    assert deadline.expired() and deadline.remaining() == 0.0
+
+
+def test_cancellation_token():
+    token = CancellationToken()
+    token.raise_if_cancelled()
+    token.cancel()
+    assert token.cancelled
+    with pytest.raises(SummaryCancelled):
+        token.raise_if_cancelled()
+    start = time.monotonic()
+    token.sleep(5)
+    assert time.monotonic() - start < 1
+
+
+def test_latency_percentile_needs_enough_samples():
+    tracker = LatencyTracker(window=10, min_samples=3)
+    tracker.record('key', 1.0)
+    tracker.record('key', 2.0)
+    assert tracker.percentile('key', 50) is None
+    for seconds in (3.0, 4.0, 5.0):
+        tracker.record('key', seconds)
+    assert tracker.percentile('key', 50) == 3.0
+    assert tracker.percentile('key', 100) == 5.0
+    for _ in range(10):
+        tracker.record('key', 9.0)
+    assert tracker.percentile('key', 0) == 9.0
@@ -0,0 +1,184 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from botocore.exceptions import ClientError
+
+import main
+from deadlines import CancellationToken, SummaryCancelled
+from main import BedrockSummarizer
+from scheduler import FairScheduler
+
+
+class FakeClient:
+    """Stands in for the bedrock-runtime client."""
+
+    def __init__(self, delay=0.0, errors=(), text='A summary. It is short.'):
+        self.delay = delay
+        self.text = text
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke_model(self, modelId, contentType, accept, body):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.errors:
+            code = self.errors.pop(0)
+            raise ClientError({'Error': {'Code': code, 'Message': code}}, 'InvokeModel')
+        payload = {
+            'content': [{'text': self.text}],
+            'usage': {'input_tokens': 10, 'output_tokens': 5},
+            'stop_reason': 'end_turn'
+        }
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+
+
+def make_summarizer(client, **options):
+    summarizer = BedrockSummarizer(**options)
+    summarizer.bedrock_runtime = client
+    summarizer._client_for = lambda region, deadline=None: client
+    return summarizer
+
+
+def statuses(results):
+    return {length: result['status'] for length, result in results.items()}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(main.random, 'uniform', lambda low, high: 0.0)
+
+
+def test_within_all_ok():
+    summarizer = make_summarizer(FakeClient())
+    results = summarizer.summarize_within('Some text.', timeout=5)
+    assert statuses(results) == {'short': 'ok', 'medium': 'ok', 'long': 'ok'}
+    assert results['long']['summary'] == 'A summary. It is short.'
+
+
+def test_within_timeout_then_skipped():
+    summarizer = make_summarizer(FakeClient(delay=0.5))
+    results = summarizer.summarize_within('Some text.', timeout=0.2)
+    assert statuses(results) == {'short': 'timeout', 'medium': 'skipped', 'long': 'skipped'}
+
+
+def test_within_skips_lengths_that_cannot_fit():
+    summarizer = make_summarizer(FakeClient())
+    for _ in range(summarizer.latency.min_samples):
+        summarizer.latency.record((summarizer.model_id, 'long'), 10.0)
+    results = summarizer.summarize_within('Some text.', timeout=2)
+    assert statuses(results) == {'short': 'ok', 'medium': 'ok', 'long': 'skipped'}
+
+
+def test_within_cancelled():
+    client = FakeClient()
+    summarizer = make_summarizer(client)
+    token = CancellationToken()
+    token.cancel()
+    results = summarizer.summarize_within('Some text.', timeout=5, cancel_token=token)
+    assert statuses(results) == {'short': 'cancelled', 'medium': 'cancelled', 'long': 'cancelled'}
+    assert client.calls == 0
+
+
+def test_within_rejected_by_quota():
+    scheduler = FairScheduler()
+    scheduler.add_tenant('default', request_budget=1)
+    summarizer = make_summarizer(FakeClient(), scheduler=scheduler)
+    results = summarizer.summarize_within('Some text.', timeout=5)
+    assert statuses(results) == {'short': 'ok', 'medium': 'rejected', 'long': 'rejected'}
+
+
+def test_within_error():
+    summarizer = make_summarizer(FakeClient(errors=['ValidationException'] * 3))
+    results = summarizer.summarize_within('Some text.', timeout=5)
+    assert statuses(results) == {'short': 'error', 'medium': 'error', 'long': 'error'}
+    assert 'ValidationException' in results['short']['error']
+
+
+def test_throttling_is_retried():
+    client = FakeClient(errors=['ThrottlingException', 'ServiceUnavailableException'])
+    summarizer = make_summarizer(client)
+    assert summarizer.generate_summary('Some text.', 'short') == 'A summary. It is short.'
+    assert client.calls == 3
+
+
+def test_retries_stop_at_max_attempts():
+    client = FakeClient(errors=['ThrottlingException'] * 10)
+    summarizer = make_summarizer(client, max_attempts=3)
+    with pytest.raises(Exception, match='ThrottlingException'):
+        summarizer.generate_summary('Some text.', 'short')
+    assert client.calls == 3
+
+
+def test_other_errors_are_not_retried():
+    client = FakeClient(errors=['ValidationException', 'ValidationException'])
+    summarizer = make_summarizer(client)
+    with pytest.raises(Exception, match='ValidationException'):
+        summarizer.generate_summary('Some text.', 'short')
+    assert client.calls == 1
+
+
+def test_backoff_never_outlives_the_deadline(monkeypatch):
+    monkeypatch.setattr(main.random, 'uniform', lambda low, high: 1.0)
+    client = FakeClient(errors=['ThrottlingException'] * 10)
+    summarizer = make_summarizer(client)
+    with pytest.raises(Exception, match='ThrottlingException'):
+        summarizer.generate_summary('Some text.', 'short', timeout=0.5)
+    assert client.calls == 1
+
+
+def test_cancel_interrupts_backoff(monkeypatch):
+    monkeypatch.setattr(main.random, 'uniform', lambda low, high: 5.0)
+    client = FakeClient(errors=['ThrottlingException'] * 10)
+    summarizer = make_summarizer(client)
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(SummaryCancelled):
+        summarizer.generate_summary('Some text.', 'short', cancel_token=token)
+    assert time.monotonic() - start < 2
+    assert client.calls == 1
+
+
+def test_stream_rejects_tiny_chunks():
+    summarizer = make_summarizer(FakeClient())
+    with pytest.raises(ValueError):
+        summarizer.summarize_stream_within(['One.', 'Two.'], max_chars=300)
+
+
+def test_stream_stops_regrouping_when_digests_do_not_shrink():
+    # Each digest is longer than half of max_chars, so regrouping cannot merge any
+    client = FakeClient(text='Long digest sentence. ' * 60)
+    summarizer = make_summarizer(client)
+    chunks = ['First chunk.', 'Second chunk.']
+    results = summarizer.summarize_stream_within(chunks, max_chars=2400)
+    assert statuses(results) == {'short': 'ok', 'medium': 'ok', 'long': 'ok'}
+    assert client.calls == len(chunks) + 3
+
+
+def test_stream_regroups_short_digests():
+    client = FakeClient(text='Digest. ' * 50)
+    summarizer = make_summarizer(client)
+    results = summarizer.summarize_stream_within(['Chunk.'] * 8, max_chars=2400)
+    assert statuses(results) == {'short': 'ok', 'medium': 'ok', 'long': 'ok'}
+    # 8 digests of ~400 chars fit in 2 groups, whose 2 digests fit max_chars; then 3 lengths
+    assert client.calls == 8 + 2 + 3
+
+
+def test_only_single_text_summaries_are_calibrated():
+    from calibration import LengthCalibrator
+
+    calibrator = LengthCalibrator()
+    summarizer = make_summarizer(FakeClient(text='A summary. It is short.</summary>'), calibrator=calibrator)
+    assert summarizer.summarize_documents(['One.', 'Two.']) == 'A summary. It is short.'
+    summarizer.summarize_stream_within(['First chunk.', 'Second chunk.'], max_chars=2400)
+    assert [sample['length'] for window in calibrator._samples.values() for sample in window] == \
+        ['short', 'medium', 'long']
+
+    summarizer.generate_summary('Some text.', 'short')
+    assert len(calibrator._samples[(summarizer.model_id, 'short')]) == 2
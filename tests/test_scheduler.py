@@ -0,0 +1,164 @@
+import threading
+import time
+
+import pytest
+
+from deadlines import CancellationToken, Deadline, DeadlineExceeded, QuotaExceeded, SummaryCancelled
+from scheduler import FairScheduler
+
+
+def acquire_in_background(scheduler, *args, **kwargs):
+    """Start acquire() on a thread; returns (thread, result dict)."""
+    result = {}
+
+    def run():
+        try:
+            result['ticket'] = scheduler.acquire(*args, **kwargs)
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, result
+
+
+def wait_until_queued(scheduler, priority, count, timeout=2.0):
+    end = time.monotonic() + timeout
+    while scheduler.metrics()['priorities'][priority]['queued'] < count:
+        assert time.monotonic() < end, "request was never queued"
+        time.sleep(0.01)
+
+
+def test_interactive_is_admitted_ahead_of_queued_batch():
+    scheduler = FairScheduler(max_concurrency=3, interactive_reserve=1)
+    batch = scheduler.acquire('a', 'batch')
+    interactive = scheduler.acquire('a', 'interactive')
+    spare = scheduler.acquire('a', 'interactive')
+
+    batch_thread, batch_result = acquire_in_background(scheduler, 'b', 'batch')
+    wait_until_queued(scheduler, 'batch', 1)
+    interactive_thread, interactive_result = acquire_in_background(scheduler, 'b', 'interactive')
+    wait_until_queued(scheduler, 'interactive', 1)
+
+    scheduler.release(spare)
+    interactive_thread.join(2)
+    assert interactive_result['ticket'].granted
+    assert 'ticket' not in batch_result
+
+    # Two interactive calls still hold 2 of the 3 slots, so batch waits for both
+    scheduler.release(batch)
+    time.sleep(0.1)
+    assert 'ticket' not in batch_result
+    scheduler.release(interactive)
+    batch_thread.join(2)
+    assert batch_result['ticket'].granted
+
+
+def test_batch_never_uses_the_interactive_reserve():
+    scheduler = FairScheduler(max_concurrency=2, interactive_reserve=1)
+    scheduler.acquire('a', 'batch')
+    with pytest.raises(DeadlineExceeded):
+        scheduler.acquire('a', 'batch', deadline=Deadline(0.1))
+    assert scheduler.acquire('a', 'interactive', deadline=Deadline(0.1)).granted
+    assert scheduler.try_acquire('a', 'batch') is None
+
+
+def test_token_budget_rejection():
+    scheduler = FairScheduler()
+    scheduler.add_tenant('a', token_budget=100)
+    ticket = scheduler.acquire('a', estimated_tokens=60)
+    with pytest.raises(QuotaExceeded):
+        scheduler.acquire('a', estimated_tokens=60)
+    scheduler.release(ticket, {'input_tokens': 20, 'output_tokens': 10})
+    scheduler.release(scheduler.acquire('a', estimated_tokens=60), None)
+
+    metrics = scheduler.metrics()['tenants']['a']
+    assert metrics['rejected_tokens'] == 1
+    assert metrics['rejected_requests'] == 0
+    assert metrics['input_tokens'] == 20 and metrics['output_tokens'] == 10
+    assert metrics['window_tokens'] == 30
+
+
+def test_request_budget_rejection():
+    scheduler = FairScheduler()
+    scheduler.add_tenant('a', request_budget=2)
+    first = scheduler.acquire('a')
+    scheduler.acquire('a')
+    with pytest.raises(QuotaExceeded):
+        scheduler.acquire('a')
+    scheduler.release(first)
+    with pytest.raises(QuotaExceeded):
+        scheduler.acquire('a')
+    assert scheduler.acquire('b').granted
+
+    metrics = scheduler.metrics()['tenants']['a']
+    assert metrics['rejected_requests'] == 2
+    assert metrics['window_requests'] == 1
+
+
+def test_try_acquire_refuses_while_requests_are_queued():
+    scheduler = FairScheduler(max_concurrency=1, interactive_reserve=0)
+    held = scheduler.acquire('a')
+    assert scheduler.try_acquire('a') is None
+
+    thread, result = acquire_in_background(scheduler, 'b')
+    wait_until_queued(scheduler, 'interactive', 1)
+    scheduler.release(held)
+    thread.join(2)
+    assert result['ticket'].granted
+    assert scheduler.try_acquire('a') is None
+
+    scheduler.release(result['ticket'])
+    ticket = scheduler.try_acquire('a')
+    assert ticket is not None and ticket.granted
+    metrics = scheduler.metrics()['tenants']['a']
+    assert metrics['opportunistic'] == 1
+    assert metrics['rejected_requests'] == metrics['rejected_tokens'] == 0
+
+
+def test_try_acquire_respects_budget_without_counting_rejections():
+    scheduler = FairScheduler()
+    scheduler.add_tenant('a', token_budget=50)
+    assert scheduler.try_acquire('a', estimated_tokens=60) is None
+    assert scheduler.metrics()['tenants']['a']['rejected_tokens'] == 0
+
+
+def test_release_twice_is_a_no_op():
+    scheduler = FairScheduler(max_concurrency=2, interactive_reserve=0)
+    ticket = scheduler.acquire('a', estimated_tokens=10)
+    scheduler.acquire('a', estimated_tokens=10)
+    scheduler.release(ticket, {'input_tokens': 5, 'output_tokens': 5})
+    scheduler.release(ticket, {'input_tokens': 5, 'output_tokens': 5})
+
+    state = scheduler._tenants['a']
+    assert state['reserved_requests'] == 1
+    assert state['reserved_tokens'] == 10
+    assert scheduler.metrics()['priorities']['interactive']['in_flight'] == 1
+    metrics = scheduler.metrics()['tenants']['a']
+    assert metrics['completed'] == 1
+    assert metrics['input_tokens'] == 5
+
+
+@pytest.mark.parametrize('stop', ['deadline', 'cancel'])
+def test_abandoned_acquire_rolls_back_its_reservation(stop):
+    scheduler = FairScheduler(max_concurrency=1, interactive_reserve=0)
+    held = scheduler.acquire('a', estimated_tokens=10)
+
+    if stop == 'deadline':
+        with pytest.raises(DeadlineExceeded):
+            scheduler.acquire('b', estimated_tokens=40, deadline=Deadline(0.1))
+    else:
+        token = CancellationToken()
+        threading.Timer(0.1, token.cancel).start()
+        with pytest.raises(SummaryCancelled):
+            scheduler.acquire('b', estimated_tokens=40, cancel_token=token)
+
+    state = scheduler._tenants['b']
+    assert state['reserved_tokens'] == 0
+    assert state['reserved_requests'] == 0
+    assert state['finish_tags']['interactive'] == 0.0
+    assert scheduler.metrics()['priorities']['interactive']['queued'] == 0
+
+    scheduler.release(held)
+    assert scheduler.metrics()['priorities']['interactive']['in_flight'] == 0
+    assert scheduler.acquire('b', deadline=Deadline(0.1)).granted
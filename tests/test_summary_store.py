@@ -0,0 +1,214 @@
+import json
+import os
+import time
+
+import pytest
+
+from summary_store import COMPACT_LOCK, SEGMENT_SUFFIX, SummaryStore, text_hash
+
+
+def add_rows(store, count, start=0):
+    for number in range(start, start + count):
+        store.append(
+            doc_id=f'doc-{number}',
+            text_hash=text_hash(f'text {number}'),
+            model='model-a' if number % 2 else 'model-b',
+            length='short',
+            summary=f'Summary {number}.',
+            input_tokens=number,
+            output_tokens=2 * number,
+            latency_ms=1.5,
+            created_at=1000.0 + number
+        )
+
+
+def segment_files(path):
+    return sorted(name for name in os.listdir(path) if name.endswith(SEGMENT_SUFFIX))
+
+
+def test_round_trip_lookup(tmp_path):
+    with SummaryStore(str(tmp_path), batch_size=3) as store:
+        add_rows(store, 7)
+        store.flush()
+        assert len(store) == 7
+        assert len(segment_files(tmp_path)) == 3
+
+        rows = store.get_by_hash(text_hash('text 4'))
+        assert [row['summary'] for row in rows] == ['Summary 4.']
+        assert rows[0]['doc_id'] == 'doc-4'
+        assert rows[0]['input_tokens'] == 4 and rows[0]['output_tokens'] == 8
+        assert rows[0]['model'] == 'model-b'
+        assert store.get_by_doc_id('doc-5')[0]['text_hash'] == text_hash('text 5')
+        assert store.get_by_hash(text_hash('text 5'), model='model-b') == []
+        assert store.get_by_doc_id('missing') == []
+
+
+def test_buffered_rows_are_visible(tmp_path):
+    store = SummaryStore(str(tmp_path), batch_size=100)
+    add_rows(store, 2)
+    assert segment_files(tmp_path) == []
+    assert store.get_by_doc_id('doc-1')[0]['summary'] == 'Summary 1.'
+    assert len(store) == 2
+    store.close()
+    assert len(segment_files(tmp_path)) == 1
+
+
+def test_reopen_and_scan(tmp_path):
+    with SummaryStore(str(tmp_path), batch_size=4) as store:
+        add_rows(store, 10)
+
+    store = SummaryStore(str(tmp_path))
+    assert len(store) == 10
+    assert store.get_by_doc_id('doc-9')[0]['created_at'] == 1009.0
+    assert [row['doc_id'] for row in store.scan(['doc_id'])] == [f'doc-{n}' for n in range(10)]
+    assert set(next(store.scan(['summary', 'length']))) == {'summary', 'length'}
+
+    destination = tmp_path / 'export.jsonl'
+    assert store.export_jsonl(str(destination)) == 10
+    with open(destination, encoding='utf-8') as f:
+        exported = [json.loads(line) for line in f]
+    assert exported[3]['summary'] == 'Summary 3.'
+    store.close()
+
+
+def test_lookup_decodes_only_one_row_group(tmp_path):
+    with SummaryStore(str(tmp_path), batch_size=10, row_group_size=4) as store:
+        add_rows(store, 10)
+        store.flush()
+        assert store.get_by_doc_id('doc-9')[0]['summary'] == 'Summary 9.'
+        assert [group for _, group in store._decoded] == [2]
+        assert store.get_by_doc_id('doc-0')[0]['summary'] == 'Summary 0.'
+        assert sorted(group for _, group in store._decoded) == [0, 2]
+
+
+def test_open_indexes_are_bounded(tmp_path):
+    with SummaryStore(str(tmp_path), batch_size=1, max_open_indexes=4) as store:
+        add_rows(store, 50)
+        for number in range(50):
+            assert store.get_by_doc_id(f'doc-{number}')[0]['summary'] == f'Summary {number}.'
+        assert len(store._open_indexes) == 4
+        assert sum(segment.index_open for segment in store._segments.values()) == 4
+
+
+def test_compact_merges_segments(tmp_path):
+    with SummaryStore(str(tmp_path), batch_size=2) as store:
+        add_rows(store, 9)
+        store.flush()
+        assert len(segment_files(tmp_path)) == 5
+        assert store.compact(target_rows=100) == 5
+        assert len(segment_files(tmp_path)) == 1
+        assert len(store) == 9
+        assert store.get_by_doc_id('doc-8')[0]['summary'] == 'Summary 8.'
+        assert [row['doc_id'] for row in store.scan(['doc_id'])] == [f'doc-{n}' for n in range(9)]
+        assert not os.path.exists(tmp_path / COMPACT_LOCK)
+
+
+def test_reader_survives_compaction_by_another_store(tmp_path):
+    with SummaryStore(str(tmp_path), batch_size=2) as writer:
+        add_rows(writer, 6)
+    reader = SummaryStore(str(tmp_path))
+    assert reader.get_by_doc_id('doc-1')[0]['summary'] == 'Summary 1.'
+
+    with SummaryStore(str(tmp_path)) as compactor:
+        assert compactor.compact(target_rows=100) == 3
+
+    assert reader.get_by_doc_id('doc-1')[0]['summary'] == 'Summary 1.'
+    assert len(reader) == 6
+    reader.close()
+
+
+def test_replaced_segments_are_hidden(tmp_path):
+    with SummaryStore(str(tmp_path), batch_size=2) as store:
+        add_rows(store, 4)
+        store.flush()
+        old = segment_files(tmp_path)
+        rows = list(store.scan())
+        # A compaction that crashed before deleting the segments it merged
+        with store._lock:
+            store._write_segment(rows, replaces=old)
+        assert len(segment_files(tmp_path)) == 3
+        assert len(store) == 4
+        assert len(store.get_by_doc_id('doc-2')) == 1
+
+
+def test_compact_respects_lock(tmp_path):
+    with SummaryStore(str(tmp_path), batch_size=1, lock_timeout=60) as store:
+        add_rows(store, 3)
+        lock = tmp_path / COMPACT_LOCK
+        lock.write_text('{}')
+        assert store.compact() == 0
+        assert len(segment_files(tmp_path)) == 3
+
+        stale = time.time() - 120
+        os.utime(lock, (stale, stale))
+        assert store.compact() == 3
+        assert not lock.exists()
+
+
+def test_invalid_rows_are_rejected_without_blocking_the_batch(tmp_path):
+    with SummaryStore(str(tmp_path), batch_size=2) as store:
+        add_rows(store, 1)
+        with pytest.raises(ValueError, match='text_hash'):
+            store.append('doc-x', 'not-a-hash', 'model-a', 'short', 'Bad.')
+        with pytest.raises(ValueError, match='summary'):
+            store.append('doc-x', text_hash('x'), 'model-a', 'short', None)
+        with pytest.raises(ValueError, match='input_tokens'):
+            store.append('doc-x', text_hash('x'), 'model-a', 'short', 'Bad.', input_tokens='many')
+        add_rows(store, 1, start=1)
+        store.flush()
+        assert len(store) == 2
+        assert store.get_by_doc_id('doc-x') == []
+        assert store.get_by_hash(text_hash('text 1').upper())[0]['doc_id'] == 'doc-1'
+
+
+def test_failed_segment_write_leaves_no_temp_files(tmp_path, monkeypatch):
+    store = SummaryStore(str(tmp_path), batch_size=100)
+    add_rows(store, 3)
+
+    def fail(path, target):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(os, 'replace', fail)
+    with pytest.raises(OSError):
+        store.flush()
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+
+    monkeypatch.undo()
+    store.close()
+    assert len(store) == 3
+
+
+def test_lookup_skips_segments_by_bloom_filter(tmp_path):
+    with SummaryStore(str(tmp_path), batch_size=10) as store:
+        add_rows(store, 50)
+        store.flush()
+        assert store.get_by_doc_id('missing') == []
+        assert sum(segment.index_open for segment in store._segments.values()) <= 1
+
+        assert store.get_by_doc_id('doc-33')[0]['summary'] == 'Summary 33.'
+        opened = [os.path.basename(segment.path) for segment in store._segments.values()
+                  if segment.index_open]
+        assert segment_files(tmp_path)[3] in opened
+
+
+def test_directory_listing_is_cached_until_it_changes(tmp_path, monkeypatch):
+    with SummaryStore(str(tmp_path), batch_size=2) as store:
+        add_rows(store, 4)
+        old = time.time() - 60
+        os.utime(tmp_path, (old, old))
+
+        scans = []
+        real_scandir = os.scandir
+
+        def counting_scandir(path):
+            scans.append(path)
+            return real_scandir(path)
+
+        monkeypatch.setattr(os, 'scandir', counting_scandir)
+        for number in range(4):
+            assert len(store.get_by_doc_id(f'doc-{number}')) == 1
+        assert len(scans) <= 1
+
+        with SummaryStore(str(tmp_path), batch_size=1) as other:
+            add_rows(other, 1, start=10)
+        assert store.get_by_doc_id('doc-10')[0]['summary'] == 'Summary 10.'